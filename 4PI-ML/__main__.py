@@ -0,0 +1,6 @@
+# Run the 4PI-ML directory itself from the repository root, e.g.
+#   python 4PI-ML train
+#   python 4PI-ML predict --user 5
+from main import cli
+
+cli()
@@ -0,0 +1,237 @@
+# Adaptive questionnaire: ask the most informative question next and stop once the top-2 domains are settled.
+import argparse
+import importlib.util
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+from main import domains, phases, phase_weights, PHASE_WEIGHT_VALUES
+from rule_engine import score_features, ENGINES
+from simulate_user import simulate_user_response
+import instrumentation
+
+PULLER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "questions_puller")
+PRIOR = 1.0  # pseudo-count per domain when guessing which option the respondent picks next
+STRATEGIES = ["adaptive", "sequence"]
+
+def load_puller():
+    """
+    questions_puller/main.py, loaded by path: both tools name their entry
+    module `main`, so a plain import would return 4PI-ML/main.py.
+    """
+    if "questions_puller_main" not in sys.modules:
+        sys.path.append(PULLER_DIR)
+        spec = importlib.util.spec_from_file_location("questions_puller_main", os.path.join(PULLER_DIR, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    return sys.modules["questions_puller_main"]
+
+def rank_order(scores):
+    """Domain indices best first; ties go to the higher domain index like gen_data."""
+    return np.argsort(scores * len(scores) + np.arange(len(scores)))[::-1]
+
+def binary_entropy(p):
+    if p <= 0 or p >= 1:
+        return 0.0
+    return -(p * math.log2(p) + (1 - p) * math.log2(1 - p))
+
+# =========================
+# SESSION
+# =========================
+class AdaptiveSession:
+    """
+    One respondent working through a form whose phase mix is fixed by
+    `phase_sequence` but whose order is chosen adaptively.
+
+    Each answer adds its phase weight to one domain, so scores, features and
+    the remaining weight update in O(1). The top 2 are settled once the 3rd
+    domain could not overtake the 2nd even if every remaining question went
+    to it, so stopping never changes the full-form result.
+    """
+
+    def __init__(self, questions, phase_sequence, domain_names=domains):
+        self.domain_names = list(domain_names)
+        self.domain_pos = {d: i for i, d in enumerate(self.domain_names)}
+        num_domains = len(self.domain_names)
+
+        self.pools = {p: {} for p in range(len(phases))}
+        self.option_domains = {}
+        for q in questions:
+            self.pools[phases.index(q["interest_phase"])][q["question_id"]] = q
+            self.option_domains[q["question_id"]] = [self.option_domain(opt) for opt in q["options"]]
+        self.remaining = np.bincount([phases.index(p) for p in phase_sequence], minlength=len(phases))
+        for p, pool in self.pools.items():
+            if self.remaining[p] > len(pool):
+                raise ValueError(f"Not enough questions for phase: {phases[p]}")
+
+        self.remaining_weight = int(self.remaining @ PHASE_WEIGHT_VALUES)
+        self.scores = np.zeros(num_domains, dtype=np.int64)
+        self.features = np.zeros(len(phases) * num_domains)
+        self.asked = []
+
+    def option_domain(self, option):
+        """Axis index of the first domain the option scores, or None (e.g. Neutral)."""
+        for name, score in option["domains"].items():
+            idx = self.domain_pos.get(name)
+            if score > 0 and idx is not None:
+                return idx
+        return None
+
+    def answer(self, question, option):
+        """Record the chosen option of `question` in O(1)."""
+        phase_idx = phases.index(question["interest_phase"])
+        if self.remaining[phase_idx] == 0 or self.pools[phase_idx].pop(question["question_id"], None) is None:
+            raise ValueError(f"Question {question['question_id']} is not open in this session")
+
+        weight = phase_weights[question["interest_phase"]]
+        domain_idx = self.option_domain(option)
+        if domain_idx is not None:
+            self.scores[domain_idx] += weight
+            self.features[phase_idx * len(self.domain_names) + domain_idx] += weight
+        self.remaining[phase_idx] -= 1
+        self.remaining_weight -= weight
+        self.asked.append((question["question_id"], domain_idx))
+
+    def settled(self):
+        if len(self.domain_names) < 3:
+            return True
+        num_domains = len(self.domain_names)
+        rank_key = self.scores * num_domains + np.arange(num_domains)
+        third, second = np.partition(rank_key, -3)[-3:-1]
+        return third + num_domains * self.remaining_weight < second
+
+    def done(self):
+        return self.remaining_weight == 0 or self.settled()
+
+    def expected_information(self, question, scores=None, top2=None):
+        """
+        Phase weight times the entropy of "does the answer land in the
+        current top 2", with option probabilities proportional to the
+        domain scores so far plus PRIOR.
+        """
+        if scores is None:
+            scores = self.scores.tolist()
+            top2 = set(rank_order(self.scores)[:2].tolist())
+        in_top2 = total = 0.0
+        for idx in self.option_domains[question["question_id"]]:
+            p = PRIOR + (scores[idx] if idx is not None else 0)
+            total += p
+            in_top2 += p if idx in top2 else 0
+        return phase_weights[question["interest_phase"]] * binary_entropy(in_top2 / total)
+
+    def next_question(self, strategy="adaptive"):
+        """
+        The open question with the highest expected information ("adaptive"),
+        or the first open question of the earliest phase with slots left
+        ("sequence"), or None when the session is done.
+        """
+        if self.done():
+            return None
+        candidates = [q for p, pool in self.pools.items() if self.remaining[p] for q in pool.values()]
+        if strategy == "sequence":
+            return candidates[0]
+        if strategy != "adaptive":
+            raise ValueError(f"Unknown strategy: {strategy} (expected one of {STRATEGIES})")
+        scores = self.scores.tolist()
+        top2 = set(rank_order(self.scores)[:2].tolist())
+        return max(candidates, key=lambda q: self.expected_information(q, scores, top2))
+
+    def top2(self):
+        return [self.domain_names[d] for d in rank_order(self.scores)[:2]]
+
+    def predict(self, engine="rule"):
+        """Domain probabilities from the 4PI-ML scorer (4-domain forms only)."""
+        if self.domain_names != list(domains):
+            raise ValueError("The 4PI-ML scorer needs a form in its 4-domain taxonomy")
+        return dict(zip(domains, score_features(self.features[None, :], engine)[0]))
+
+def session_for_age_group(age_group):
+    """A session over a freshly pulled form for `age_group`."""
+    puller = load_puller()
+    questions = puller.pull_questions(age_group)
+    seen = {d for q in questions for opt in q["options"] for d, s in opt["domains"].items() if s > 0}
+    axis = domains if seen <= set(domains) else sorted(seen)
+    return AdaptiveSession(questions, puller.PHASE_SEQUENCES[age_group], axis)
+
+# =========================
+# SIMULATION
+# =========================
+def synthetic_form(record):
+    """
+    One question per simulate_user_response answer, with an option for
+    every domain, plus the option index the respondent picks.
+    """
+    questions, picks = [], []
+    for i, (domain_idx, phase_idx) in enumerate(record[1:]):
+        questions.append({
+            "question_id": i,
+            "interest_phase": phases[phase_idx],
+            "options": [{"domains": {d: 1}} for d in domains]
+        })
+        picks.append(domain_idx)
+    return questions, picks
+
+def run_session(questions, picks, strategy="adaptive"):
+    by_id = {q["question_id"]: (q, pick) for q, pick in zip(questions, picks)}
+    session = AdaptiveSession(questions, [q["interest_phase"] for q in questions])
+    while (question := session.next_question(strategy)) is not None:
+        q, pick = by_id[question["question_id"]]
+        session.answer(q, q["options"][pick])
+    return session
+
+def simulate(num_users=10_000, seed=None, strategy="adaptive"):
+    """
+    Average questions asked and top-2 agreement with the full form for
+    simulate_user_response respondents.
+    """
+    random.seed(seed)
+    asked = np.empty(num_users, dtype=np.int64)
+    agree = np.empty(num_users, dtype=bool)
+    for u in range(num_users):
+        questions, picks = synthetic_form(simulate_user_response())
+        session = run_session(questions, picks, strategy)
+        weights = [phase_weights[q["interest_phase"]] for q in questions]
+        full_scores = np.bincount(picks, weights=weights, minlength=len(domains))
+        asked[u] = len(session.asked)
+        agree[u] = set(rank_order(full_scores)[:2]) == set(rank_order(session.scores)[:2])
+    return {"users": num_users, "strategy": strategy, "mean_asked": float(asked.mean()),
+            "asked_histogram": np.bincount(asked, minlength=16).tolist(), "agreement": float(agree.mean())}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive early-stopping questionnaire")
+    sub = parser.add_subparsers(dest="command")
+
+    p_sim = sub.add_parser("simulate", help="measure questions asked and agreement with the full form")
+    p_sim.add_argument("--users", type=int, default=10_000)
+    p_sim.add_argument("--seed", type=int, default=None)
+    p_sim.add_argument("--strategy", choices=STRATEGIES + ["both"], default="both")
+
+    p_demo = sub.add_parser("demo", help="run one pulled form with a random respondent")
+    p_demo.add_argument("age_group", nargs="?", default="highered")
+    p_demo.add_argument("--engine", choices=ENGINES, default="rule")
+    p_demo.add_argument("--seed", type=int, default=None)
+    instrumentation.add_profile_arguments(parser, "4PI-ML/adaptive.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        if args.command == "demo":
+            random.seed(args.seed)
+            session = session_for_age_group(args.age_group)
+            while (question := session.next_question()) is not None:
+                option = random.choice(question["options"])
+                session.answer(question, option)
+                print(f"{question['question_id']} [{question['interest_phase']}] -> {option['text']}")
+            print(f"\nAsked {len(session.asked)} questions, top 2: {session.top2()}")
+            if session.domain_names == list(domains):
+                print(session.predict(args.engine))
+        else:
+            strategies = STRATEGIES if getattr(args, "strategy", "both") == "both" else [args.strategy]
+            for strategy in strategies:
+                result = simulate(getattr(args, "users", 10_000), getattr(args, "seed", None), strategy)
+                print(f"{strategy}: {result['mean_asked']:.2f} questions asked on average, "
+                      f"{result['agreement']:.2%} agreement with the full form")
+                print(f"  questions asked histogram: {result['asked_histogram']}")
@@ -0,0 +1,250 @@
+# Packed 4-bit answer records and an append-only columnar store for them.
+# Run from the repository root:
+#   python 4PI-ML/answer_store.py import 4PI-ML/4PI.csv 4PI-ML/dataset/answers
+#   python 4PI-ML/answer_store.py synth 4PI-ML/dataset/answers --users 10000000 --seed 7
+#   python 4PI-ML/answer_store.py features 4PI-ML/dataset/answers 4PI-ML/dataset/answers_features.npy
+import argparse
+import json
+import os
+
+import numpy as np
+
+from main import records_to_answers, NUM_DOMAINS, NUM_PHASES, PHASE_WEIGHT_VALUES
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+NUM_QUESTIONS = 15
+# one nibble per answer: code = phase_idx * NUM_DOMAINS + domain_idx, which is
+# also the answer's column in the (N, 16) feature matrix
+RECORD_BYTES = (NUM_QUESTIONS + 1) // 2
+STORE_VERSION = 1
+CHUNK_SIZE = 1_000_000
+
+ANSWERS_FILE = "answers.u8"
+NAMES_FILE = "names.bin"
+OFFSETS_FILE = "names.i64"
+META_FILE = "meta.json"
+
+# byte value -> feature contribution of its high and low nibble
+_NIBBLE_WEIGHTS = np.repeat(PHASE_WEIGHT_VALUES, NUM_DOMAINS)
+_BYTE_FEATURES = np.zeros((256, NUM_DOMAINS * NUM_PHASES))
+_BYTE_FEATURES[np.arange(256), np.arange(256) >> 4] += _NIBBLE_WEIGHTS[np.arange(256) >> 4]
+_BYTE_FEATURES[np.arange(256), np.arange(256) & 0xF] += _NIBBLE_WEIGHTS[np.arange(256) & 0xF]
+# with an odd question count the last low nibble is padding
+_LAST_BYTE_FEATURES = _BYTE_FEATURES.copy()
+if NUM_QUESTIONS % 2:
+    _LAST_BYTE_FEATURES[np.arange(256), np.arange(256) & 0xF] -= _NIBBLE_WEIGHTS[np.arange(256) & 0xF]
+
+# =========================
+# PACKING
+# =========================
+def pack_answers(answers):
+    """(N, 15, 2) (domain_index, phase_index) answers -> (N, 8) uint8 records."""
+    answers = records_to_answers(answers)
+    if answers.shape[1] != NUM_QUESTIONS:
+        raise ValueError(f"Expected {NUM_QUESTIONS} answers per record, got {answers.shape[1]}")
+    codes = np.zeros((answers.shape[0], RECORD_BYTES * 2), dtype=np.uint8)
+    codes[:, :NUM_QUESTIONS] = answers[..., 1] * NUM_DOMAINS + answers[..., 0]
+    return (codes[:, 0::2] << 4) | codes[:, 1::2]
+
+def unpack_answers(packed):
+    """(N, 8) uint8 records -> (N, 15, 2) (domain_index, phase_index) answers."""
+    packed = np.asarray(packed, dtype=np.uint8)
+    codes = np.empty((packed.shape[0], RECORD_BYTES * 2), dtype=np.intp)
+    codes[:, 0::2] = packed >> 4
+    codes[:, 1::2] = packed & 0xF
+    codes = codes[:, :NUM_QUESTIONS]
+    return np.stack([codes % NUM_DOMAINS, codes // NUM_DOMAINS], axis=-1)
+
+def pack_records(records):
+    """Names and packed answers of `[name, (domain, phase), ...]` records."""
+    names = [r[0] if isinstance(r[0], str) else "" for r in records]
+    return names, pack_answers(records)
+
+def packed_to_features(packed, chunk_size=CHUNK_SIZE):
+    """
+    (N, 16) feature matrix, identical to records_to_features on the unpacked
+    answers, built from a 256-entry byte table one chunk of rows at a time.
+    """
+    packed = np.asarray(packed)
+    features = np.empty((packed.shape[0], NUM_DOMAINS * NUM_PHASES))
+    for start in range(0, packed.shape[0], chunk_size):
+        block = np.asarray(packed[start:start + chunk_size])
+        out = features[start:start + chunk_size]
+        out[:] = _LAST_BYTE_FEATURES[block[:, -1]]
+        for col in range(RECORD_BYTES - 1):
+            out += _BYTE_FEATURES[block[:, col]]
+    return features
+
+# =========================
+# COLUMNAR STORE
+# =========================
+class AnswerStore:
+    """
+    Append-only directory of respondent records, one file per column:
+
+      answers.u8   (N, 8) packed answers
+      names.bin    UTF-8 names, back to back
+      names.i64    end offset of each name in names.bin
+      meta.json    committed row count and layout
+
+    The name columns are only created once a named record is appended, so
+    anonymous (e.g. synthetic) stores cost 8 bytes per respondent.
+
+    Appends write the column files first and then replace meta.json, so a
+    crash mid-append leaves the last committed rows intact; bytes past them
+    are truncated on the next append. Readers memory-map the columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta.get("version") != STORE_VERSION or self.meta.get("record_bytes") != RECORD_BYTES:
+                raise ValueError(f"{path} is not a version {STORE_VERSION} answer store with {RECORD_BYTES}-byte records")
+        else:
+            self.meta = {"version": STORE_VERSION, "record_bytes": RECORD_BYTES,
+                         "num_questions": NUM_QUESTIONS, "rows": 0, "has_names": False, "name_bytes": 0}
+            self._write_meta()
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _write_meta(self):
+        tmp_path = self._file(META_FILE) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self._file(META_FILE))
+
+    def _append_column(self, name, committed_bytes, data):
+        with open(self._file(name), "ab") as f:
+            f.truncate(committed_bytes)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @instrumentation.timed("answer_store.append")
+    def append(self, packed, names=None, extra_meta=None):
+        """
+        Append (N, 8) packed records and optional names; returns the new row
+        count. `extra_meta` is merged into meta.json by the same atomic write
+        that commits the rows (e.g. an ingest checkpoint).
+        """
+        packed = np.ascontiguousarray(packed, dtype=np.uint8)
+        if packed.ndim != 2 or packed.shape[1] != RECORD_BYTES:
+            raise ValueError(f"Expected packed records of shape (N, {RECORD_BYTES}), got {packed.shape}")
+        if names is not None and len(names) != len(packed):
+            raise ValueError(f"Got {len(names)} names for {len(packed)} records")
+        rows = self.meta["rows"]
+
+        self._append_column(ANSWERS_FILE, rows * RECORD_BYTES, packed.tobytes())
+
+        if self.meta["has_names"] or (names is not None and any(names)):
+            encoded = [n.encode("utf-8") for n in (names if names is not None else [""] * len(packed))]
+            offsets = self.meta["name_bytes"] + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            if not self.meta["has_names"]:
+                # earlier rows were anonymous: their names all end at offset 0
+                offsets = np.concatenate([np.zeros(rows, dtype=np.int64), offsets])
+            self._append_column(NAMES_FILE, self.meta["name_bytes"], b"".join(encoded))
+            self._append_column(OFFSETS_FILE, (rows if self.meta["has_names"] else 0) * 8, offsets.tobytes())
+            self.meta["has_names"] = True
+            self.meta["name_bytes"] = int(offsets[-1]) if len(offsets) else self.meta["name_bytes"]
+
+        self.meta["rows"] = rows + len(packed)
+        if extra_meta:
+            self.meta.update(extra_meta)
+        self._write_meta()
+        instrumentation.count("answer_store.rows_appended", len(packed))
+        return self.meta["rows"]
+
+    def append_records(self, records):
+        names, packed = pack_records(records)
+        return self.append(packed, names)
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape)
+
+    def packed(self):
+        """Read-only (N, 8) memory map of the committed records."""
+        return self._map(ANSWERS_FILE, np.uint8, (len(self), RECORD_BYTES))
+
+    def answers(self, start=0, stop=None):
+        return unpack_answers(self.packed()[start:stop])
+
+    def names(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        if not self.meta["has_names"]:
+            return [""] * (stop - start)
+        offsets = self._map(OFFSETS_FILE, np.int64, (len(self),))
+        ends = offsets[start:stop]
+        begin = int(offsets[start - 1]) if start else 0
+        blob = self._map(NAMES_FILE, np.uint8, (self.meta["name_bytes"],))[begin:int(ends[-1])].tobytes()
+        bounds = np.concatenate([[0], ends - begin])
+        return [blob[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def features(self, start=0, stop=None):
+        return packed_to_features(self.packed()[start:stop])
+
+    def iter_features(self, chunk_size=CHUNK_SIZE):
+        """Yield (start, (n, 16) features) over the store in chunks of `chunk_size` rows."""
+        packed = self.packed()
+        for start in range(0, len(packed), chunk_size):
+            yield start, packed_to_features(packed[start:start + chunk_size], chunk_size)
+
+def synth_packed(rng, num_users):
+    """Packed records with uniform random answers, like simulate_user_response."""
+    answers = np.stack([
+        rng.integers(0, NUM_DOMAINS, (num_users, NUM_QUESTIONS)),
+        rng.integers(0, NUM_PHASES, (num_users, NUM_QUESTIONS))
+    ], axis=-1)
+    return pack_answers(answers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packed respondent answer store")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/answer_store.prof")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="append the respondents of a survey export")
+    p_import.add_argument("csv_path")
+    p_import.add_argument("store")
+
+    p_synth = sub.add_parser("synth", help="append random respondents")
+    p_synth.add_argument("store")
+    p_synth.add_argument("--users", type=int, default=1_000_000)
+    p_synth.add_argument("--seed", type=int, default=None)
+    p_synth.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    p_features = sub.add_parser("features", help="expand a store into an (N, 16) .npy feature matrix")
+    p_features.add_argument("store")
+    p_features.add_argument("out_path")
+    p_features.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        store = AnswerStore(args.store)
+        if args.command == "import":
+            from simulate_user import load_user_records
+            store.append_records(load_user_records(args.csv_path))
+        elif args.command == "synth":
+            rng = np.random.default_rng(args.seed)
+            for start in range(0, args.users, args.chunk_size):
+                store.append(synth_packed(rng, min(args.chunk_size, args.users - start)))
+        else:
+            out = np.lib.format.open_memmap(args.out_path, mode="w+", dtype=np.float32,
+                                            shape=(len(store), NUM_DOMAINS * NUM_PHASES))
+            for start, block in store.iter_features(args.chunk_size):
+                out[start:start + len(block)] = block
+            out.flush()
+        print(f"{args.store}: {len(store)} records, {len(store) * RECORD_BYTES} answer bytes")
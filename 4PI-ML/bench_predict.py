@@ -0,0 +1,40 @@
+# Benchmark: per-user predict_user loop vs vectorised predict_batch
+# Run from the repository root after `python 4PI-ML/main.py train`:
+#   python 4PI-ML/bench_predict.py
+import time
+import numpy as np
+
+from main import predict_user, predict_batch, records_to_features, answers_to_features
+from simulate_user import simulate_user_response
+
+# =========================
+# CONFIGURATION
+# =========================
+COHORT_SIZES = [100, 1000, 10000]
+LOOP_LIMIT = 1000  # the per-user loop is extrapolated beyond this many users
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def loop_predict(records):
+    return np.array([list(predict_user(r[1:]).values()) for r in records])
+
+if __name__ == "__main__":
+    print(f"\n{'users':>8} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>9}")
+    for n in COHORT_SIZES:
+        records = [simulate_user_response() for _ in range(n)]
+
+        looped = records[:LOOP_LIMIT]
+        loop_scores, loop_time = time_call(loop_predict, looped)
+        loop_time *= n / len(looped)
+
+        batch_scores, batch_time = time_call(predict_batch, records)
+
+        # Both paths must agree on features and probabilities
+        assert np.array_equal(records_to_features(looped),
+                              np.vstack([answers_to_features(r[1:]) for r in looped]))
+        assert np.allclose(loop_scores, batch_scores[:len(looped)])
+
+        print(f"{n:>8} {loop_time:>10.3f} {batch_time:>10.4f} {loop_time / batch_time:>8.0f}x")
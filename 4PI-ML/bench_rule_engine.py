@@ -0,0 +1,58 @@
+# Benchmark and agreement report: closed-form rule engine vs the learned models.
+# Run from the repository root:
+#   python 4PI-ML/bench_rule_engine.py
+import argparse
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, f1_score
+
+from main import build_models, load_dataset, DATASET_PATH
+from rule_engine import RuleEngine, rerank_scores
+
+# =========================
+# CONFIGURATION
+# =========================
+BENCH_ROWS = 100000
+
+def time_predict(predict, X, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def agreement(a, b):
+    """Fraction of rows with the same top-2 set, and of individual domain labels."""
+    return np.all(a == b, axis=1).mean(), (a == b).mean()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule engine vs learned models")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--rows", type=int, default=BENCH_ROWS, help="rows used for the latency benchmark")
+    args = parser.parse_args()
+
+    X, y = load_dataset(args.dataset)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_bench = np.resize(X_test, (args.rows, X.shape[1]))
+
+    rule = RuleEngine()
+    models = {name: model.fit(X_train, y_train) for name, model in build_models().items()}
+    rerank = lambda X_: rerank_scores(X_, rule, models["LogisticRegression"])
+
+    # name -> (probability function, label function)
+    predictors = {"RuleEngine": (rule.predict_proba, rule.predict)}
+    for name, model in models.items():
+        predictors[name] = (model.predict_proba, model.predict)
+    predictors["Rule+LR rerank"] = (rerank, lambda X_: (rerank(X_) > 0.5).astype(int))
+
+    rule_pred = rule.predict(X_test)
+    print(f"\n{'predictor':<20} {'acc':>6} {'F1':>6} {'agree(set)':>11} {'agree(label)':>13} {'ms/1k rows':>11}")
+    for name, (proba_fn, predict_fn) in predictors.items():
+        y_pred = predict_fn(X_test)
+        seconds = time_predict(proba_fn, X_bench)
+        set_agree, label_agree = agreement(y_pred, rule_pred)
+        print(f"{name:<20} {accuracy_score(y_test, y_pred):>6.3f} {f1_score(y_test, y_pred, average='micro'):>6.3f} "
+              f"{set_agree:>11.3f} {label_agree:>13.3f} {seconds * 1000 / (args.rows / 1000):>11.4f}")
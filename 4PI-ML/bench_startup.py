@@ -0,0 +1,74 @@
+# Startup benchmark: `python -X importtime` cost of the 4PI-ML entry points.
+# Run from the repository root:
+#   python 4PI-ML/bench_startup.py --record 4PI-ML/startup_history.jsonl
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# =========================
+# CONFIGURATION
+# =========================
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = {
+    "import main": "import main",
+    "import serve": "import serve",
+    "predict_user": "import main; main.predict_user([(0, 3)] * 15)",
+}
+HEAVY_MODULES = ["pandas", "sklearn", "matplotlib", "scipy"]
+REPEATS = 5
+
+def import_profile(code):
+    """
+    Run `code` under -X importtime and return {module: (cumulative us, nesting depth)}.
+    Depth 0 marks modules imported directly rather than by another import.
+    """
+    env = dict(os.environ, PYTHONPATH=ML_DIR)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        profile[name.strip()] = (int(cumulative_us), depth)
+    return profile
+
+def wall_time(code):
+    env = dict(os.environ, PYTHONPATH=ML_DIR)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def measure(code, repeats=REPEATS):
+    profile = import_profile(code)
+    top_level = {name: us for name, (us, depth) in profile.items() if depth == 0}
+    return {
+        "wall_ms": statistics.median(wall_time(code) for _ in range(repeats)) * 1000,
+        "import_ms": sum(top_level.values()) / 1000,
+        "heavy_imports": [m for m in HEAVY_MODULES if m in profile],
+        "slowest": sorted(((name, us) for name, (us, depth) in profile.items() if depth <= 1),
+                          key=lambda x: -x[1])[:6],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="4PI-ML startup benchmark")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--record", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.repeats) for name, code in ENTRY_POINTS.items()}
+
+    for name, r in results.items():
+        print(f"\n{name}: wall={r['wall_ms']:.0f}ms imports={r['import_ms']:.0f}ms "
+              f"heavy={', '.join(r['heavy_imports']) or 'none'}")
+        for module, us in r["slowest"]:
+            print(f"  {us / 1000:>8.1f}ms  {module}")
+
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}) + "\n")
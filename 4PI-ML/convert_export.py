@@ -0,0 +1,113 @@
+# Streaming conversion of survey exports (4PI.csv) into a (N, 16) feature matrix.
+# Run from the repository root:
+#   python 4PI-ML/convert_export.py 4PI-ML/4PI.csv 4PI-ML/dataset/export_features.npy
+import argparse
+import csv
+import itertools
+from collections import Counter
+
+import numpy as np
+
+from main import records_to_features, NUM_DOMAINS, NUM_PHASES
+from simulate_user import load_question_index, QUESTION_BANK_PATH
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+CHUNK_SIZE = 10000
+FEATURE_DTYPE = np.float32  # feature cells are small integer sums, exact in float32
+
+def count_rows(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return sum(1 for _ in reader)
+
+def column_positions(header, index):
+    """
+    Map each answer column to its question position in the bank, by question
+    text when the header matches the bank and by column order otherwise.
+    """
+    questions = header[1:]
+    if all(q.strip() in index.position for q in questions):
+        return [index.position[q.strip()] for q in questions]
+    return list(range(len(questions)))
+
+def rows_to_answers(rows, positions, index, unmatched):
+    """
+    (N, Q, 2) answers of parsed CSV rows (name first). Unmatched answers fall
+    back to the question's first option and are counted in `unmatched`.
+    """
+    answers = np.empty((len(rows), len(positions), 2), dtype=np.intp)
+    for r, row in enumerate(rows):
+        cells = row[1:len(positions) + 1]
+        cells += [""] * (len(positions) - len(cells))  # short rows count as unmatched
+        for c, (position, selected_text) in enumerate(zip(positions, cells)):
+            answer = index.answer(position, selected_text)
+            if answer is None:
+                unmatched[index.questions[position]] += 1
+                answer = index.fallback(position)
+            answers[r, c] = answer
+    return answers
+
+def convert_export(csv_path, out_path, chunk_size=CHUNK_SIZE, names_path=None, bank_path=QUESTION_BANK_PATH):
+    """
+    Stream `csv_path` in chunks of `chunk_size` rows and write the feature
+    matrix to `out_path` as a memory-mapped .npy file. Unmatched answers fall
+    back to the question's first option and are reported as counts.
+    """
+    index = load_question_index(bank_path)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        raise ValueError(f"{csv_path} is empty: expected a header row")
+    positions = column_positions(header, index)
+    num_rows = count_rows(csv_path)
+    features = np.lib.format.open_memmap(out_path, mode="w+", dtype=FEATURE_DTYPE,
+                                         shape=(num_rows, NUM_DOMAINS * NUM_PHASES))
+    unmatched = Counter()
+    names_file = open(names_path, "w", encoding="utf-8") if names_path else None
+
+    try:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)  # header
+            row_offset = 0
+
+            while True:
+                chunk = list(itertools.islice(reader, chunk_size))
+                if not chunk:
+                    break
+
+                answers = rows_to_answers(chunk, positions, index, unmatched)
+                if names_file:
+                    names_file.writelines(row[0].strip() + "\n" for row in chunk)
+
+                features[row_offset:row_offset + len(chunk)] = records_to_features(answers)
+                row_offset += len(chunk)
+    finally:
+        if names_file:
+            names_file.close()
+
+    features.flush()
+    del features
+
+    return {"rows": num_rows, "unmatched_answers": sum(unmatched.values()), "unmatched_by_question": dict(unmatched)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a 4PI survey export to a .npy feature matrix")
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path")
+    parser.add_argument("--names", help="optional text file receiving one respondent name per row")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--bank", default=QUESTION_BANK_PATH)
+    instrumentation.add_profile_arguments(parser, "4PI-ML/convert_export.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        stats = convert_export(args.csv_path, args.out_path, args.chunk_size, args.names, args.bank)
+        print(f"Converted {stats['rows']} rows -> {args.out_path}")
+        print(f"Unmatched answers: {stats['unmatched_answers']}")
+        for question, count in sorted(stats["unmatched_by_question"].items(), key=lambda x: -x[1]):
+            print(f"  {count:>6}  {question}")
@@ -1,6 +1,21 @@
+# Synthetic 4PI dataset generator.
+# Run from the repository root:
+#   python 4PI-ML/dataset/gen_data.py --users 1000 --format csv                   # legacy data.csv
+#   python 4PI-ML/dataset/gen_data.py --users 10000000 --workers 8 --seed 7     # chunked .npy parts
+import argparse
+import importlib.util
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
+_spec = importlib.util.spec_from_file_location(
+    "questions_path", os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "questions_path.py"))
+_spec.loader.exec_module(importlib.util.module_from_spec(_spec))
+import instrumentation
+
 # =========================
 # CONFIGURATION
 # =========================
@@ -8,6 +23,10 @@ NUM_USERS = 1000
 NUM_QUESTIONS = 15
 NUM_DOMAINS = 4
 NUM_PHASES = 4
+CHUNK_SIZE = 250000  # rows per .npy part
+
+CSV_PATH = "4PI-ML/dataset/data.csv"
+SHARD_DIR = "4PI-ML/dataset/shards"
 
 domains = ["STEM", "Business, Economics & Entrepreneurship", "Arts & Creative Expression", "Health, Medicine & Life Sciences"]
 phases = ["Curiosity Activation", "Engagement Sustainment",
@@ -19,49 +38,119 @@ phase_weights = {
     "Personal Relevance Formation": 3,
     "Passion-Driven Mastery": 4
 }
+PHASE_WEIGHT_VALUES = np.array([phase_weights[p] for p in phases])
+
+FEATURE_COLUMNS = [f"F{i+1}" for i in range(NUM_DOMAINS*NUM_PHASES)]
 
 # =========================
 # FUNCTIONS
 # =========================
-def generate_user_answer():
-    answers = []
-    for _ in range(NUM_QUESTIONS):
-        domain_choice = np.random.randint(0, NUM_DOMAINS)
-        phase_choice = np.random.randint(0, NUM_PHASES)
-        answers.append((domain_choice, phase_choice))
-    return answers
-
-def answers_to_features(answers):
-    feature_vector = np.zeros(NUM_DOMAINS * NUM_PHASES)
-    for domain_choice, phase_choice in answers:
-        feature_vector[phase_choice * NUM_DOMAINS + domain_choice] += phase_weights[phases[phase_choice]]
-    return feature_vector
-
-def generate_target_domains(answers):
-    domain_scores = np.zeros(NUM_DOMAINS)
-    for domain_choice, phase_choice in answers:
-        domain_scores[domain_choice] += phase_weights[phases[phase_choice]]
-    top_indices = domain_scores.argsort()[-2:]  # pick top 2 domains
-    target = np.zeros(NUM_DOMAINS)
-    target[top_indices] = 1
+def generate_user_answers(rng, num_users):
+    """Draw (N, 15) domain and phase choices for a batch of users."""
+    domain_choice = rng.integers(0, NUM_DOMAINS, size=(num_users, NUM_QUESTIONS))
+    phase_choice = rng.integers(0, NUM_PHASES, size=(num_users, NUM_QUESTIONS))
+    return domain_choice, phase_choice
+
+def answers_to_features(domain_choice, phase_choice):
+    num_users = domain_choice.shape[0]
+    num_features = NUM_DOMAINS * NUM_PHASES
+    flat_idx = np.arange(num_users)[:, None] * num_features + phase_choice * NUM_DOMAINS + domain_choice
+    features = np.bincount(flat_idx.ravel(), weights=PHASE_WEIGHT_VALUES[phase_choice].ravel(),
+                           minlength=num_users * num_features)
+    return features.reshape(num_users, num_features)
+
+def generate_target_domains(domain_choice, phase_choice):
+    """
+    Mark the top-2 domains by phase-weighted score. Ties go to the higher
+    domain index, matching the stable argsort of the per-user version.
+    """
+    num_users = domain_choice.shape[0]
+    flat_idx = np.arange(num_users)[:, None] * NUM_DOMAINS + domain_choice
+    domain_scores = np.bincount(flat_idx.ravel(), weights=PHASE_WEIGHT_VALUES[phase_choice].ravel(),
+                                minlength=num_users * NUM_DOMAINS).reshape(num_users, NUM_DOMAINS)
+
+    # Scores are integers, so this key is unique per row and encodes the tie-break
+    rank_key = domain_scores * NUM_DOMAINS + np.arange(NUM_DOMAINS)
+    top_indices = np.argpartition(rank_key, -2, axis=1)[:, -2:]
+    target = np.zeros((num_users, NUM_DOMAINS))
+    np.put_along_axis(target, top_indices, 1, axis=1)
     return target
 
+def generate_dataset(rng, num_users):
+    domain_choice, phase_choice = generate_user_answers(rng, num_users)
+    return answers_to_features(domain_choice, phase_choice), generate_target_domains(domain_choice, phase_choice)
+
+# =========================
+# OUTPUT
+# =========================
+def write_csv(X_array, y_array, path=CSV_PATH):
+    df_features = pd.DataFrame(X_array, columns=FEATURE_COLUMNS)
+    df_targets = pd.DataFrame(y_array, columns=domains)
+    df = pd.concat([df_features, df_targets], axis=1)
+    df.to_csv(path, index=False)
+
+def write_part(job):
+    """Generate one chunk and save it as part-NNNNN-X.npy / part-NNNNN-y.npy (uint8)."""
+    part, num_users, seed_seq, out_dir = job
+    X_part, y_part = generate_dataset(np.random.default_rng(seed_seq), num_users)
+    np.save(os.path.join(out_dir, f"part-{part:05d}-X.npy"), X_part.astype(np.uint8))
+    np.save(os.path.join(out_dir, f"part-{part:05d}-y.npy"), y_part.astype(np.uint8))
+    return num_users
+
+def write_parts(num_users, seed, out_dir=SHARD_DIR, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Generate `num_users` rows as independent chunks. Each chunk gets its own
+    child seed, so the output depends on the seed and chunk size but not on
+    the number of worker processes.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # drop the manifest and parts of an earlier run, which may have had more parts
+    for name in os.listdir(out_dir):
+        if name == "manifest.json" or (name.startswith("part-") and name.endswith(".npy")):
+            os.remove(os.path.join(out_dir, name))
+    sizes = [min(chunk_size, num_users - start) for start in range(0, num_users, chunk_size)]
+    root_seed = np.random.SeedSequence(seed)
+    seeds = root_seed.spawn(len(sizes))
+    jobs = [(part, size, seed_seq, out_dir) for part, (size, seed_seq) in enumerate(zip(sizes, seeds))]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write_part, jobs))
+    else:
+        for job in jobs:
+            write_part(job)
+
+    manifest = {
+        "num_rows": num_users,
+        "parts": len(jobs),
+        "chunk_size": chunk_size,
+        "seed": root_seed.entropy,  # recorded so unseeded runs can be reproduced
+        "feature_columns": FEATURE_COLUMNS,
+        "target_columns": domains,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
 # =========================
 # GENERATE DATASET
 # =========================
-X_list, y_list = [], []
-for _ in range(NUM_USERS):
-    ans = generate_user_answer()
-    X_list.append(answers_to_features(ans))
-    y_list.append(generate_target_domains(ans))
-
-X_array = np.array(X_list)
-y_array = np.array(y_list)
-
-# Combine features and targets into a single CSV
-df_features = pd.DataFrame(X_array, columns=[f"F{i+1}" for i in range(NUM_DOMAINS*NUM_PHASES)])
-df_targets = pd.DataFrame(y_array, columns=domains)
-df = pd.concat([df_features, df_targets], axis=1)
-df.to_csv("4PI-ML/dataset/data.csv", index=False)
-
-print("Synthetic dataset generated")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic 4PI dataset")
+    parser.add_argument("--users", type=int, default=NUM_USERS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--format", choices=["npy", "csv"], default="npy")
+    parser.add_argument("--out", help=f"CSV file or part directory (default {CSV_PATH} / {SHARD_DIR})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="processes generating parts in parallel")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/dataset/gen_data.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        if args.format == "csv":
+            X_array, y_array = generate_dataset(np.random.default_rng(args.seed), args.users)
+            write_csv(X_array, y_array, args.out or CSV_PATH)
+        else:
+            write_parts(args.users, args.seed, args.out or SHARD_DIR, args.chunk_size, args.workers)
+
+    print("Synthetic dataset generated")
@@ -0,0 +1,131 @@
+# Out-of-core training: stream the dataset in chunks and fit partial_fit-capable models.
+# Run from the repository root:
+#   python 4PI-ML/main.py train --incremental --dataset 4PI-ML/dataset/shards
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+
+from main import NUM_DOMAINS, NUM_PHASES, DATASET_PATH, MODEL_PATH, feature_layout
+from model_store import save_artifact, dataset_sha256, dataset_parts
+
+# =========================
+# CONFIGURATION
+# =========================
+CHUNK_SIZE = 100000
+HOLDOUT_FRACTION = 0.2
+HOLDOUT_SEED = 42
+EPOCHS = 3
+TARGET_CLASSES = [np.array([0, 1])] * NUM_DOMAINS
+
+# =========================
+# STREAMING DATASET
+# =========================
+def iter_dataset_chunks(path=DATASET_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Yield (X, y) chunks of at most `chunk_size` rows from a CSV file or a
+    part directory written by dataset/gen_data.py, without loading it whole.
+    """
+    num_features = NUM_DOMAINS * NUM_PHASES
+    if os.path.isdir(path):
+        for x_path, y_path in dataset_parts(path):
+            X_part = np.load(x_path, mmap_mode="r")
+            y_part = np.load(y_path, mmap_mode="r")
+            for start in range(0, X_part.shape[0], chunk_size):
+                yield (np.asarray(X_part[start:start + chunk_size], dtype=float),
+                       np.asarray(y_part[start:start + chunk_size], dtype=int))
+    else:
+        for df in pd.read_csv(path, chunksize=chunk_size):
+            yield df.iloc[:, :num_features].values, df.iloc[:, num_features:].values.astype(int)
+
+def iter_split_chunks(path=DATASET_PATH, chunk_size=CHUNK_SIZE, holdout_fraction=HOLDOUT_FRACTION, seed=HOLDOUT_SEED):
+    """
+    Yield (X_train, y_train, X_test, y_test) per chunk. Holdout rows are drawn
+    from a per-chunk seeded RNG, so every pass sees the same split.
+    """
+    for chunk_no, (X, y) in enumerate(iter_dataset_chunks(path, chunk_size)):
+        holdout = np.random.default_rng([seed, chunk_no]).random(X.shape[0]) < holdout_fraction
+        yield X[~holdout], y[~holdout], X[holdout], y[holdout]
+
+# =========================
+# STREAMING METRICS
+# =========================
+class StreamingMetrics:
+    """
+    Accumulates subset accuracy and micro-F1 (as accuracy_score / f1_score
+    with average="micro" compute them) over holdout chunks.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.exact = 0
+        self.tp = 0
+        self.fp = 0
+        self.fn = 0
+
+    def update(self, y_true, y_pred):
+        y_true = np.asarray(y_true, dtype=bool)
+        y_pred = np.asarray(y_pred, dtype=bool)
+        self.rows += y_true.shape[0]
+        self.exact += int(np.all(y_true == y_pred, axis=1).sum())
+        self.tp += int((y_true & y_pred).sum())
+        self.fp += int((~y_true & y_pred).sum())
+        self.fn += int((y_true & ~y_pred).sum())
+
+    @property
+    def accuracy(self):
+        return self.exact / self.rows if self.rows else 0.0
+
+    @property
+    def f1(self):
+        denominator = 2 * self.tp + self.fp + self.fn
+        return 2 * self.tp / denominator if denominator else 0.0
+
+# =========================
+# MODEL DEFINITION
+# =========================
+def build_incremental_models():
+    return {
+        "SGDLogistic": MultiOutputClassifier(SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)),
+        "NaiveBayes": MultiOutputClassifier(MultinomialNB()),
+    }
+
+# =========================
+# TRAIN & COMPARE
+# =========================
+def train_incremental(dataset_path=DATASET_PATH, model_path=MODEL_PATH, chunk_size=CHUNK_SIZE, epochs=EPOCHS):
+    """
+    Fit every candidate with partial_fit over `epochs` streamed passes, score
+    them on the streamed holdout and save the best one like train_models does.
+    """
+    models = build_incremental_models()
+
+    for epoch in range(epochs):
+        for X_train, y_train, _, _ in iter_split_chunks(dataset_path, chunk_size):
+            if X_train.shape[0] == 0:
+                continue
+            for model in models.values():
+                model.partial_fit(X_train, y_train, classes=TARGET_CLASSES)
+        print(f"Epoch {epoch + 1}/{epochs} done")
+
+    metrics = {name: StreamingMetrics() for name in models}
+    for _, _, X_test, y_test in iter_split_chunks(dataset_path, chunk_size):
+        if X_test.shape[0] == 0:
+            continue
+        for name, model in models.items():
+            metrics[name].update(y_test, model.predict(X_test))
+
+    results = {}
+    for name, m in metrics.items():
+        results[name] = {"accuracy": m.accuracy, "f1": m.f1}
+        print(f"{name}: Accuracy={m.accuracy:.3f}, F1={m.f1:.3f} (holdout rows={m.rows})")
+
+    best_model_name = max(results, key=lambda x: results[x]["f1"])
+    print(f"\nBest model selected: {best_model_name}")
+
+    artifact = save_artifact(model_path, models[best_model_name], best_model_name, results,
+                             feature_layout(), dataset_sha256(dataset_path))
+    print(f"Model artifact saved to: {model_path}")
+    return artifact
@@ -0,0 +1,338 @@
+# Ingestion daemon: watch a drop directory for survey exports and score new rows as they arrive.
+# Run from the repository root:
+#   python 4PI-ML/ingest.py 4PI-ML/incoming 4PI-ML/dataset/ingested
+#   python 4PI-ML/ingest.py 4PI-ML/incoming 4PI-ML/dataset/ingested --once
+import argparse
+import csv
+import hashlib
+import io
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from main import NUM_DOMAINS, predict_features, records_to_features
+from answer_store import AnswerStore, pack_answers
+from convert_export import column_positions, rows_to_answers
+from simulate_user import load_question_index, QUESTION_BANK_PATH
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+POLL_INTERVAL = 2.0  # seconds between scans of the drop directory
+SETTLE_SECONDS = 5.0  # a file untouched this long is complete, even without a trailing newline
+READ_BYTES = 1 << 20  # new bytes read per batch (rounded down to whole rows)
+MAX_PENDING = 8  # batches in flight before the reader waits for the oldest to commit
+FILE_PATTERN = ".csv"
+EXECUTORS = ["process", "thread"]
+
+SCORES_FILE = "scores.f8"
+
+# =========================
+# OUTPUT STORE
+# =========================
+class ScoredStore(AnswerStore):
+    """
+    AnswerStore with an (N, 4) float64 score column. The ingest checkpoint
+    (per-file byte offsets) lives in meta.json and is committed by the same
+    atomic write as the rows it covers, so a restart neither loses nor
+    repeats rows. The store is append-only: rows of an export that is later
+    replaced by different content stay in it (see Ingestor.file_entry).
+    """
+
+    def checkpoint(self):
+        return self.meta.get("checkpoint", {})
+
+    def append_scored(self, packed, names, scores, checkpoint):
+        scores = np.ascontiguousarray(scores, dtype="<f8")
+        if scores.shape != (len(packed), NUM_DOMAINS):
+            raise ValueError(f"Expected scores of shape ({len(packed)}, {NUM_DOMAINS}), got {scores.shape}")
+        self._append_column(SCORES_FILE, len(self) * NUM_DOMAINS * 8, scores.tobytes())
+        return self.append(packed, names, extra_meta={"checkpoint": checkpoint})
+
+    def scores(self, start=0, stop=None):
+        return self._map(SCORES_FILE, np.float64, (len(self), NUM_DOMAINS))[start:stop]
+
+# =========================
+# READING
+# =========================
+def complete_rows(data):
+    """
+    Length of the prefix of `data` made of whole CSV rows: up to the last
+    newline outside a quoted field, so answers containing line breaks are
+    never split across batches.
+    """
+    end = pos = 0
+    quoted = False
+    while (newline := data.find(b"\n", pos)) >= 0:
+        quoted ^= data.count(b'"', pos, newline) % 2 == 1
+        if not quoted:
+            end = newline + 1
+        pos = newline + 1
+    return end
+
+def read_batch(path, offset, settled, read_bytes=READ_BYTES):
+    """
+    Whole rows of `path` starting at byte `offset`, at most about
+    `read_bytes` of them unless a single row is longer. A trailing row
+    without a newline is only taken once the file has `settled`.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = b""
+        while True:
+            block = f.read(read_bytes)
+            data += block
+            end = complete_rows(data)
+            if end or not block:
+                break
+    if len(block) < read_bytes and settled and data[end:].strip():
+        end = len(data)
+    return data[:end]
+
+def prefix_digest(path, length, read_bytes=READ_BYTES):
+    """sha256 of the first `length` bytes of `path`, or None when the file is shorter."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            block = f.read(min(read_bytes, length))
+            if not block:
+                return None
+            digest.update(block)
+            length -= len(block)
+    return digest
+
+def parse_rows(data, encoding="utf-8"):
+    """
+    Non-empty CSV rows of `data`. Bytes that do not decode are replaced with
+    U+FFFD, so a damaged row is kept (its answers count as unmatched) rather
+    than failing the whole batch; the second value is how many rows had them.
+    """
+    rows = [row for row in csv.reader(io.StringIO(data.decode(encoding, errors="replace"))) if row]
+    return rows, sum(any("\ufffd" in cell for cell in row) for row in rows)
+
+# =========================
+# SCORING
+# =========================
+def score_batch(job):
+    """Worker: CSV bytes -> (names, packed answers, scores, unmatched counts, undecodable rows)."""
+    data, positions, bank_path = job
+    with instrumentation.timer("ingest.score_batch"):
+        rows, undecodable = parse_rows(data)
+        unmatched = Counter()
+        answers = rows_to_answers(rows, positions, load_question_index(bank_path), unmatched)
+        scores = predict_features(records_to_features(answers))
+    return [row[0].strip() for row in rows], pack_answers(answers), scores, unmatched, undecodable
+
+class Ingestor:
+    """
+    One scan of the drop directory submits every file's new rows in
+    batches to a bounded pool. At most `max_pending` batches are in flight:
+    when the queue is full the reader commits the oldest batch before
+    reading more, so memory stays bounded during bursts and batches are
+    committed in read order.
+
+    A batch that fails is not committed, and neither is any later batch of
+    the same file: the file's checkpoint stays at its last committed batch
+    and it is read again from there on the next scan.
+    """
+
+    def __init__(self, drop_dir, store_path, bank_path=QUESTION_BANK_PATH, workers=None,
+                 executor="process", max_pending=MAX_PENDING, settle_seconds=SETTLE_SECONDS,
+                 read_bytes=READ_BYTES):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor} (expected one of {EXECUTORS})")
+        self.drop_dir = drop_dir
+        self.store = ScoredStore(store_path)
+        self.bank_path = bank_path
+        self.max_pending = max_pending
+        self.settle_seconds = settle_seconds
+        self.read_bytes = read_bytes
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        self.pool = pool_class(max_workers=workers or os.cpu_count() or 1)
+        self.pending = deque()
+        # committed progress per file ({inode, offset, positions, sha256 of the bytes up to offset,
+        # reingested}); reading may run ahead of it
+        self.checkpoint = {name: dict(entry) for name, entry in self.store.checkpoint().items()}
+        self.read_offsets = {name: entry["offset"] for name, entry in self.checkpoint.items()}
+        self.digests = {}  # running sha256 of each file's committed bytes, checked on first sight
+        self.unmatched = Counter()
+        self.undecodable = 0
+        self.failed = set()  # files skipped for the rest of this scan after a failed batch
+
+    def close(self):
+        self.drain()
+        self.pool.shutdown()
+
+    def commit_oldest(self):
+        name, offset, data, future = self.pending.popleft()
+        try:
+            names, packed, scores, unmatched, undecodable = future.result()
+        except Exception as exc:
+            self.discard(name, exc)
+            return 0
+        digest = self.digests[name].copy()
+        digest.update(data)
+        checkpoint = dict(self.checkpoint)
+        checkpoint[name] = dict(checkpoint[name], offset=offset, sha256=digest.hexdigest())
+        self.store.append_scored(packed, names, scores, checkpoint)
+        self.checkpoint, self.digests[name] = checkpoint, digest
+        self.unmatched.update(unmatched)
+        self.undecodable += undecodable
+        instrumentation.count("ingest.rows", len(packed))
+        return len(packed)
+
+    def discard(self, name, exc):
+        """Drop the batches of `name` still in flight and rewind its reading to the checkpoint."""
+        offset = self.checkpoint[name]["offset"]
+        print(f"Scoring a batch of {name} failed ({exc!r}); retrying from byte {offset} on the next scan")
+        for batch in self.pending:
+            if batch[0] == name:
+                batch[3].cancel()
+        self.pending = deque(batch for batch in self.pending if batch[0] != name)
+        self.read_offsets[name] = offset
+        self.failed.add(name)
+        instrumentation.count("ingest.failed_batches")
+
+    def drain(self):
+        rows = 0
+        while self.pending:
+            rows += self.commit_oldest()
+        return rows
+
+    def submit(self, name, data, end_offset):
+        rows = 0
+        while len(self.pending) >= self.max_pending:
+            rows += self.commit_oldest()
+        if name in self.failed:
+            return rows  # an earlier batch of this file failed while waiting: `data` is re-read next scan
+        job = (data, self.checkpoint[name]["positions"], self.bank_path)
+        self.pending.append((name, end_offset, data, self.pool.submit(score_batch, job)))
+        return rows
+
+    def new_entry(self, name, stat, reingested=0):
+        entry = {"inode": stat.st_ino, "offset": 0, "positions": None,
+                 "sha256": hashlib.sha256().hexdigest(), "reingested": reingested}
+        self.checkpoint[name] = entry
+        self.read_offsets[name] = 0
+        self.digests[name] = hashlib.sha256()
+        return entry
+
+    def file_entry(self, name, stat):
+        """
+        Checkpoint entry of `name`. When a file is first seen after a start,
+        or was replaced or truncated, its committed bytes are hashed again
+        and compared with the checkpoint: an export rewritten with rows
+        appended continues after the rows already stored. A file that no
+        longer starts with them is ingested again from the start; the rows
+        stored from its earlier content stay in the append-only store, and
+        the entry's `reingested` count records that it happened.
+        """
+        entry = self.checkpoint.get(name)
+        if entry is None:
+            return self.new_entry(name, stat), 0
+        changed = entry["inode"] != stat.st_ino or stat.st_size < self.read_offsets[name]
+        if not changed and name in self.digests:
+            return entry, 0
+
+        rows = self.drain() if changed else 0  # batches read from the earlier content
+        entry = self.checkpoint[name]
+        digest = prefix_digest(os.path.join(self.drop_dir, name), entry["offset"], self.read_bytes)
+        if digest is not None and digest.hexdigest() == entry["sha256"]:
+            if changed:
+                print(f"{name} was replaced; it still starts with the {entry['offset']} bytes already "
+                      "ingested, continuing after them")
+            entry["inode"] = stat.st_ino
+            self.digests[name] = digest
+            self.read_offsets[name] = entry["offset"]
+            return entry, rows
+        print(f"{name} no longer starts with the rows already ingested; ingesting it again from the start "
+              "(rows stored from its earlier content are kept)")
+        return self.new_entry(name, stat, entry["reingested"] + 1), rows
+
+    def read_header(self, name, path, entry, settled):
+        data = read_batch(path, 0, settled)
+        end = data.find(b"\n") + 1 or len(data)
+        if not data[:end].strip():
+            return False
+        header = next(csv.reader(io.StringIO(data[:end].decode("utf-8-sig"))))
+        entry["positions"] = column_positions(header, load_question_index(self.bank_path))
+        entry["offset"] = end
+        self.digests[name].update(data[:end])
+        entry["sha256"] = self.digests[name].hexdigest()
+        return True
+
+    def ingest_file(self, name, stat):
+        if name in self.failed:
+            return 0
+        path = os.path.join(self.drop_dir, name)
+        entry, rows = self.file_entry(name, stat)
+        settled = time.time() - stat.st_mtime >= self.settle_seconds
+
+        if entry["positions"] is None:
+            if not self.read_header(name, path, entry, settled):
+                return rows
+            self.read_offsets[name] = entry["offset"]
+
+        while name not in self.failed and self.read_offsets[name] < stat.st_size:
+            data = read_batch(path, self.read_offsets[name], settled, self.read_bytes)
+            if not data:
+                break
+            self.read_offsets[name] += len(data)
+            rows += self.submit(name, data, self.read_offsets[name])
+        return rows
+
+    def scan(self):
+        """Ingest the new rows of every export in the drop directory; returns rows committed."""
+        files = []
+        for entry in os.scandir(self.drop_dir):
+            if entry.name.endswith(FILE_PATTERN):
+                try:
+                    files.append((entry.name, entry.stat()))
+                except FileNotFoundError:
+                    pass  # removed since the listing
+        rows = 0
+        self.failed.clear()
+        for name, stat in sorted(files, key=lambda f: (f[1].st_mtime, f[0])):
+            rows += self.ingest_file(name, stat)
+        return rows + self.drain()
+
+    def run(self, interval=POLL_INTERVAL, once=False):
+        try:
+            while True:
+                start = time.perf_counter()
+                rows = self.scan()
+                if rows:
+                    print(f"Ingested {rows} rows in {time.perf_counter() - start:.2f}s "
+                          f"({len(self.store)} stored, {sum(self.unmatched.values())} unmatched answers, "
+                          f"{self.undecodable} rows with undecodable bytes)")
+                if once:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopping; committing batches in flight")
+        finally:
+            self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a drop directory and score new survey export rows")
+    parser.add_argument("drop_dir", help="directory receiving *.csv survey exports")
+    parser.add_argument("store", help="output store (answers, names, scores and the checkpoint)")
+    parser.add_argument("--bank", default=QUESTION_BANK_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--executor", choices=EXECUTORS, default="process")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="batches in flight before reading pauses")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between directory scans")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="seconds without writes before a trailing row without newline is taken")
+    parser.add_argument("--once", action="store_true", help="ingest what is there and exit")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/ingest.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        ingestor = Ingestor(args.drop_dir, args.store, args.bank, args.workers, args.executor,
+                            args.max_pending, args.settle)
+        ingestor.run(args.interval, args.once)
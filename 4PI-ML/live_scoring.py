@@ -0,0 +1,200 @@
+# Incremental scoring of a form while it is being filled in or edited.
+# Run from the repository root:
+#   python 4PI-ML/live_scoring.py --edits 100000 --seed 7
+import argparse
+import random
+import time
+
+import numpy as np
+
+from main import (domains, NUM_DOMAINS, NUM_PHASES, PHASE_WEIGHT_VALUES, answers_to_features,
+                  get_model, predict_features, score_uncached)
+from numpy_model import export_model, expit
+from rule_engine import AMBIGUITY_MARGIN, ENGINES, _rule_engine
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+NUM_QUESTIONS = 15
+RESYNC_EVERY = 1024  # incremental logit updates between exact recomputes (bounds float drift)
+
+def linear_params(model):
+    """
+    (coef (16, 4), intercept (4,), exact) of a logistic model, or None when
+    the model is not linear (forests, pickled estimators without coef_).
+    """
+    if hasattr(model, "coef"):
+        return model.coef, model.intercept, model.exact
+    if hasattr(getattr(model, "estimators_", [None])[0], "coef_"):
+        try:
+            arrays = export_model(model)
+        except ValueError:
+            return None
+        return arrays["coef"], arrays["intercept"], True
+    return None
+
+# =========================
+# SESSION
+# =========================
+class LiveSession:
+    """
+    Answers of one respondent keyed by question position. Setting, changing
+    or clearing an answer moves one phase weight in the 16-cell feature
+    vector and the 4 domain totals (the scores generate_target_domains
+    ranks), so every update is O(1) and nothing is rebuilt from the answers.
+
+    With a linear model the logits are kept too: each update adds or removes
+    weight * coef[cell], so scores() is one expit over 4 values instead of a
+    predict_proba call. Other models score the current feature row: a
+    `model` passed in through its predict_proba, the loaded model through
+    main.predict_features and its cache.
+    """
+
+    def __init__(self, engine="ml", model=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine} (expected one of {ENGINES})")
+        self.engine = engine
+        self.answers = {}  # position -> (domain_index, phase_index)
+        self.features = np.zeros(NUM_DOMAINS * NUM_PHASES)
+        self.totals = np.zeros(NUM_DOMAINS)
+
+        self.model = model
+        self.linear = None
+        if engine != "rule":
+            self.linear = linear_params(model if model is not None else get_model())
+        if self.linear is not None:
+            coef, intercept, _ = self.linear
+            self.logits = intercept.astype(float)
+            self.updates = 0
+
+    def __len__(self):
+        return len(self.answers)
+
+    def _apply(self, domain_idx, phase_idx, sign):
+        weight = sign * PHASE_WEIGHT_VALUES[phase_idx]
+        cell = phase_idx * NUM_DOMAINS + domain_idx
+        self.features[cell] += weight
+        self.totals[domain_idx] += weight
+        if self.linear is not None:
+            self.logits += weight * self.linear[0][cell]
+            self.updates += 1
+            if self.updates >= RESYNC_EVERY:
+                self.resync()
+
+    def set_answer(self, position, domain_idx, phase_idx):
+        """Answer (or re-answer) the question at `position`."""
+        if not (0 <= domain_idx < NUM_DOMAINS and 0 <= phase_idx < NUM_PHASES):
+            raise ValueError(f"Domain or phase index out of range: ({domain_idx}, {phase_idx})")
+        previous = self.answers.get(position)
+        if previous == (domain_idx, phase_idx):
+            return
+        if previous is not None:
+            self._apply(*previous, -1)
+        self.answers[position] = (domain_idx, phase_idx)
+        self._apply(domain_idx, phase_idx, 1)
+
+    def remove_answer(self, position):
+        previous = self.answers.pop(position, None)
+        if previous is None:
+            raise ValueError(f"No answer at position {position}")
+        self._apply(*previous, -1)
+
+    def resync(self):
+        """Recompute the logits from the feature vector, dropping accumulated rounding."""
+        coef, intercept, _ = self.linear
+        self.logits = self.features @ coef + intercept
+        self.updates = 0
+
+    def ml_scores(self):
+        if self.linear is not None:
+            return expit(self.logits, self.linear[2])
+        if self.model is not None:
+            return np.array([p[0, 1] for p in self.model.predict_proba(self.features[None, :])])
+        return predict_features(self.features[None, :])[0]
+
+    def scores(self):
+        """(4,) domain probabilities from the session's engine, like rule_engine.score_features."""
+        if self.engine == "ml":
+            return self.ml_scores()
+        margins = _rule_engine.score_margins(self.totals[None, :])[0]
+        scores = 1 / (1 + np.exp(-margins / _rule_engine.temperature))
+        if self.engine == "rerank" and 2 * np.abs(margins).min() < AMBIGUITY_MARGIN:
+            scores = self.ml_scores()
+        return scores
+
+    def predict(self):
+        return dict(zip(domains, self.scores()))
+
+    def top2(self):
+        """Top-2 domains by phase-weighted total; ties go to the higher index like gen_data."""
+        rank_key = self.totals * NUM_DOMAINS + np.arange(NUM_DOMAINS)
+        return [domains[d] for d in np.argsort(rank_key)[::-1][:2]]
+
+# =========================
+# BENCHMARK
+# =========================
+def random_edits(num_edits, rng):
+    """Mostly answers and re-answers of random positions, with some clears."""
+    edits = []
+    for _ in range(num_edits):
+        position = rng.randrange(NUM_QUESTIONS)
+        if rng.random() < 0.1:
+            edits.append((position, None, None))
+        else:
+            edits.append((position, rng.randrange(NUM_DOMAINS), rng.randrange(NUM_PHASES)))
+    return edits
+
+def apply_edit(session, edit):
+    position, domain_idx, phase_idx = edit
+    if domain_idx is not None:
+        session.set_answer(position, domain_idx, phase_idx)
+    elif position in session.answers:
+        session.remove_answer(position)
+
+def benchmark(num_edits=10_000, seed=None):
+    """
+    Per-edit latency of a live session against rebuilding the features with
+    answers_to_features and calling predict_proba, plus the largest score
+    difference between the two.
+    """
+    edits = random_edits(num_edits, random.Random(seed))
+    session = LiveSession("ml")
+    live = np.empty((num_edits, NUM_DOMAINS))
+    start = time.perf_counter()
+    for i, edit in enumerate(edits):
+        apply_edit(session, edit)
+        live[i] = session.scores()
+    live_s = time.perf_counter() - start
+
+    answers = {}
+    full = np.empty((num_edits, NUM_DOMAINS))
+    start = time.perf_counter()
+    for i, (position, domain_idx, phase_idx) in enumerate(edits):
+        if domain_idx is None:
+            answers.pop(position, None)
+        else:
+            answers[position] = (domain_idx, phase_idx)
+        full[i] = score_uncached(answers_to_features(answers.values()))[0]
+    full_s = time.perf_counter() - start
+
+    return {
+        "edits": num_edits,
+        "linear": session.linear is not None,
+        "live_us": live_s / num_edits * 1e6,
+        "full_us": full_s / num_edits * 1e6,
+        "max_abs_diff": float(np.abs(live - full).max())
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental scoring against full recomputes")
+    parser.add_argument("--edits", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=None)
+    instrumentation.add_profile_arguments(parser, "4PI-ML/live_scoring.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        result = benchmark(args.edits, args.seed)
+    print(f"{result['edits']} edits ({'linear logits' if result['linear'] else 'cached model'}): "
+          f"{result['live_us']:.1f}us live vs {result['full_us']:.1f}us full recompute per edit, "
+          f"max score difference {result['max_abs_diff']:.2e}")
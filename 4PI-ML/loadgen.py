@@ -0,0 +1,80 @@
+# Loopback load generator for serve.py using simulated respondents.
+# Start the server first, then run from the repository root:
+#   python 4PI-ML/loadgen.py --requests 5000 --concurrency 32
+import argparse
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+
+from simulate_user import simulate_user_response
+
+# =========================
+# CONFIGURATION
+# =========================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8040
+
+def worker(host, port, num_requests, latencies, failures):
+    conn = http.client.HTTPConnection(host, port)
+    for _ in range(num_requests):
+        body = json.dumps({"answers": simulate_user_response()[1:]}).encode("utf-8")
+        start = time.perf_counter()
+        conn.request("POST", "/score", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            failures.append(response.status)
+    conn.close()
+
+def fetch_metrics(host, port):
+    conn = http.client.HTTPConnection(host, port)
+    conn.request("GET", "/metrics")
+    metrics = json.loads(conn.getresponse().read())
+    conn.close()
+    return metrics
+
+def run_load(host=DEFAULT_HOST, port=DEFAULT_PORT, total_requests=5000, concurrency=32):
+    latencies, failures = [], []
+    per_worker, extra = divmod(total_requests, concurrency)
+    threads = [
+        threading.Thread(target=worker, args=(host, port, per_worker + (i < extra), latencies, failures))
+        for i in range(concurrency)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {
+        "requests": len(latencies),
+        "failures": len(failures),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_p50_ms": p50,
+        "latency_p99_ms": p99,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the 4PI scoring service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    client = run_load(args.host, args.port, args.requests, args.concurrency)
+    print("\nClient side:")
+    for key, value in client.items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    print("\nServer side:")
+    for key, value in fetch_metrics(args.host, args.port).items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -1,12 +1,13 @@
 # ml_prediction.py
+import argparse
+import os
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.multioutput import MultiOutputClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, f1_score
-import matplotlib.pyplot as plt
+from model_store import save_artifact, load_artifact, export_artifact, dataset_sha256, dataset_parts, numpy_model_path
+from numpy_model import load_numpy_model, model_from_arrays
+from prediction_cache import PredictionCache, model_token
+
+import questions_path  # noqa: F401
+import instrumentation
 
 # =========================
 # CONFIGURATION
@@ -23,41 +24,110 @@ phase_weights = {
 NUM_DOMAINS = len(domains)
 NUM_PHASES = len(phases)
 
+PREDICTION_CACHE_SIZE = 65536  # distinct feature rows memoised per loaded model (0 disables)
+
+DATASET_PATH = "4PI-ML/dataset/data.csv"
+MODEL_PATH = "4PI-ML/models/4pi_model.pkl"
+NUMPY_MODEL_PATH = numpy_model_path(MODEL_PATH)
+
+def feature_layout():
+    return {"domains": domains, "phases": phases, "phase_weights": phase_weights}
+
 # =========================
 # LOAD DATASET
 # =========================
-df = pd.read_csv("4PI-ML/dataset/data.csv")
-X = df.iloc[:, :NUM_DOMAINS*NUM_PHASES].values
-y = df.iloc[:, NUM_DOMAINS*NUM_PHASES:].values
+def load_dataset(path=DATASET_PATH):
+    if os.path.isdir(path):
+        # part directory written by dataset/gen_data.py
+        parts = dataset_parts(path)
+        X = np.concatenate([np.load(x_path) for x_path, _ in parts]).astype(float)
+        y = np.concatenate([np.load(y_path) for _, y_path in parts])
+        return X, y
 
-# =========================
-# TRAIN-TEST SPLIT
-# =========================
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    X = df.iloc[:, :NUM_DOMAINS*NUM_PHASES].values
+    y = df.iloc[:, NUM_DOMAINS*NUM_PHASES:].values
+    return X, y
 
 # =========================
 # MODEL DEFINITION
 # =========================
-models = {
-    "LogisticRegression": MultiOutputClassifier(LogisticRegression(max_iter=500)),
-    "RandomForest": MultiOutputClassifier(RandomForestClassifier(n_estimators=200))
-}
+def build_models(n_jobs=None, estimator_n_jobs=None):
+    """
+    n_jobs parallelises the 4 outputs of each MultiOutputClassifier,
+    estimator_n_jobs the trees inside each RandomForest.
+    """
+    from sklearn.multioutput import MultiOutputClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import RandomForestClassifier
+
+    return {
+        "LogisticRegression": MultiOutputClassifier(LogisticRegression(max_iter=500), n_jobs=n_jobs),
+        "RandomForest": MultiOutputClassifier(RandomForestClassifier(n_estimators=200, n_jobs=estimator_n_jobs),
+                                              n_jobs=n_jobs)
+    }
 
 # =========================
 # TRAIN & COMPARE
 # =========================
-results = {}
-for name, model in models.items():
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred, average="micro")
-    results[name] = {"accuracy": acc, "f1": f1}
-    print(f"{name}: Accuracy={acc:.3f}, F1={f1:.3f}")
+def train_models(dataset_path=DATASET_PATH, model_path=MODEL_PATH):
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score, f1_score
+
+    X, y = load_dataset(dataset_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    models = build_models()
+    results = {}
+    for name, model in models.items():
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+        acc = accuracy_score(y_test, y_pred)
+        f1 = f1_score(y_test, y_pred, average="micro")
+        results[name] = {"accuracy": acc, "f1": f1}
+        print(f"{name}: Accuracy={acc:.3f}, F1={f1:.3f}")
+
+    best_model_name = max(results, key=lambda x: results[x]["f1"])
+    print(f"\nBest model selected: {best_model_name}")
+
+    artifact = save_artifact(model_path, models[best_model_name], best_model_name, results,
+                             feature_layout(), dataset_sha256(dataset_path))
+    print(f"Model artifact saved to: {model_path}")
+    return artifact
+
+# =========================
+# MODEL LOADING
+# =========================
+best_model = None  # loaded lazily on first prediction
+model_artifact = None
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+@instrumentation.timed("main.load_model")
+def load_model(path=None):
+    """
+    Load a model for inference. By default the NumPy export is preferred,
+    which needs neither sklearn nor pandas; the pickled artifact is the
+    fallback for models that cannot be exported.
+    """
+    global best_model, model_artifact
+    if path is None:
+        path = NUMPY_MODEL_PATH if os.path.exists(NUMPY_MODEL_PATH) else MODEL_PATH
+
+    if path.endswith(".npz"):
+        arrays, model_artifact = load_numpy_model(path, feature_layout())
+        best_model = model_from_arrays(arrays)
+    else:
+        model_artifact = load_artifact(path, feature_layout())
+        best_model = model_artifact["model"]
+    prediction_cache.bind(model_token(path))
+    return best_model
 
-best_model_name = max(results, key=lambda x: results[x]["f1"])
-best_model = models[best_model_name]
-print(f"\nBest model selected: {best_model_name}")
+def get_model():
+    if best_model is None:
+        return load_model()
+    return best_model
 
 # =========================
 # FUNCTION TO PREDICT USER RECORD
@@ -69,15 +139,92 @@ def answers_to_features(answers):
     return feature_vector.reshape(1, -1)
 
 def predict_user(answers):
-    features = answers_to_features(answers)
-    y_pred_prob = best_model.predict_proba(features)
-    scores = np.array([p[:,1] for p in y_pred_prob]).flatten()
+    scores = predict_features(answers_to_features(answers))[0]
     return dict(zip(domains, scores))
 
+# =========================
+# BATCH SCORING
+# =========================
+PHASE_WEIGHT_VALUES = np.array([phase_weights[p] for p in phases], dtype=float)
+
+def records_to_answers(records):
+    """
+    Normalise a batch of records into an (N, Q, 2) integer array of
+    (domain_index, phase_index) pairs. Records may be an array of that shape
+    or an iterable of answer lists, optionally led by the user's name.
+    """
+    if isinstance(records, np.ndarray):
+        answers = records
+    else:
+        answers = np.array([r[1:] if isinstance(r[0], str) else r for r in records], dtype=np.intp)
+        if answers.size == 0:
+            answers = answers.reshape(0, 0, 2)
+    if answers.ndim != 3 or answers.shape[2] != 2:
+        raise ValueError(f"Expected answers of shape (N, Q, 2), got {answers.shape}")
+    if answers.size and (answers.min() < 0 or answers[..., 0].max() >= NUM_DOMAINS
+                         or answers[..., 1].max() >= NUM_PHASES):
+        raise ValueError("Domain or phase index out of range")
+    return answers
+
+@instrumentation.timed("main.records_to_features")
+def records_to_features(records):
+    """
+    Vectorised answers_to_features: builds the (N, 16) feature matrix with a
+    single bincount scatter-add over flat (row, feature) indices.
+    """
+    answers = records_to_answers(records)
+    n = answers.shape[0]
+    num_features = NUM_DOMAINS * NUM_PHASES
+    domain_idx = answers[..., 0]
+    phase_idx = answers[..., 1]
+    flat_idx = np.arange(n)[:, None] * num_features + phase_idx * NUM_DOMAINS + domain_idx
+    features = np.bincount(flat_idx.ravel(), weights=PHASE_WEIGHT_VALUES[phase_idx].ravel(),
+                           minlength=n * num_features)
+    return features.reshape(n, num_features)
+
+def predict_features(features):
+    """
+    Return an (N, 4) array of domain probabilities for a feature matrix.
+    Duplicate rows are scored once and rows seen before come from
+    prediction_cache.
+    """
+    get_model()  # loading binds prediction_cache to the model
+    return prediction_cache.predict(features, score_uncached)
+
+def score_uncached(features):
+    model = get_model()
+    with instrumentation.timer("main.predict_proba"):
+        y_pred_prob = model.predict_proba(features)
+    instrumentation.count("main.rows_scored", len(features))
+    return np.column_stack([p[:, 1] for p in y_pred_prob])
+
+def predict_batch(records):
+    """
+    Score a whole cohort in one pass. Returns an (N, 4) probability array
+    with columns in the order of `domains`.
+    """
+    return predict_features(records_to_features(records))
+
+def score_feature_file(features_path, out_path, chunk_size=100000):
+    """
+    Score a (N, 16) .npy feature matrix, e.g. from convert_export.py, in
+    memory-bounded chunks and write the (N, 4) probabilities to `out_path`.
+    """
+    features = np.load(features_path, mmap_mode="r")
+    scores = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float64,
+                                       shape=(features.shape[0], NUM_DOMAINS))
+    for start in range(0, features.shape[0], chunk_size):
+        scores[start:start + chunk_size] = predict_features(features[start:start + chunk_size])
+    scores.flush()
+    return features.shape[0]
+
 # =========================
 # RADAR CHART & EXPLANATION
 # =========================
-def plot_radar_chart(scores, labels, title="Domain Prediction"):
+@instrumentation.timed("main.plot_radar_chart")
+def plot_radar_chart(scores, labels, title="Domain Prediction", path="4PI-ML/result.png"):
+    import matplotlib.pyplot as plt
+
     angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
     scores = np.concatenate((list(scores), [scores[0]]))
     angles += angles[:1]
@@ -88,7 +235,7 @@ def plot_radar_chart(scores, labels, title="Domain Prediction"):
     ax.set_thetagrids(np.degrees(angles[:-1]), labels)
     ax.set_ylim(0,1)
     ax.set_title(title)
-    plt.savefig("4PI-ML/result.png")
+    plt.savefig(path)
     plt.close()
 
 def explain_prediction(scores, labels):
@@ -98,13 +245,71 @@ def explain_prediction(scores, labels):
         print(f"{domain}: {score:.2f}")
 
 # =========================
-# EXAMPLE USER RECORD
+# COMMAND LINE
 # =========================
-from simulate_user import real_user_response, simulate_user_response
+def predict_example(user_index):
+    from simulate_user import real_user_response
+
+    record = real_user_response(user_index)
+    my_prediction = predict_user(record[1:])
+    print(f"\nPredicted domain scores for {record[0]}: ", my_prediction)
+
+    plot_radar_chart(list(my_prediction.values()), domains, title="Your Domain Prediction")
+    explain_prediction(list(my_prediction.values()), domains)
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="4PI domain prediction")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/main.prof")
+    subparsers = parser.add_subparsers(dest="command")
+
+    train_parser = subparsers.add_parser("train", help="train, compare and save the best model")
+    train_parser.add_argument("--dataset", default=DATASET_PATH)
+    train_parser.add_argument("--model", default=MODEL_PATH)
+    train_parser.add_argument("--incremental", action="store_true",
+                              help="stream the dataset in chunks and train partial_fit models (out-of-core)")
+    train_parser.add_argument("--chunk-size", type=int, default=100000)
+    train_parser.add_argument("--epochs", type=int, default=3)
+    train_parser.add_argument("--cv", type=int, metavar="FOLDS",
+                              help="select the model by k-fold CV (see model_selection.py) instead of one split")
+    train_parser.add_argument("--workers", type=int, default=1)
+    train_parser.add_argument("--latency-weight", type=float, default=0.0)
+
+    predict_parser = subparsers.add_parser("predict", help="score a respondent from 4PI.csv")
+    predict_parser.add_argument("--user", type=int, default=5, help="row index in 4PI.csv")
+    predict_parser.add_argument("--model", help=".npz export or .pkl artifact (default: export if present)")
+
+    score_parser = subparsers.add_parser("score", help="score a .npy feature matrix from convert_export.py")
+    score_parser.add_argument("features", help="(N, 16) .npy feature file")
+    score_parser.add_argument("out", help="destination .npy file for (N, 4) domain probabilities")
+    score_parser.add_argument("--model", help=".npz export or .pkl artifact (default: export if present)")
+
+    export_parser = subparsers.add_parser("export", help="write the NumPy-only export of a saved artifact")
+    export_parser.add_argument("--model", default=MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        run_command(args)
 
-record = real_user_response(5)
-my_prediction = predict_user(record[1:])
-print(f"\nPredicted domain scores for {record[0]}: ", my_prediction)
+def run_command(args):
+    if args.command == "train" and args.incremental:
+        from incremental import train_incremental
+        train_incremental(args.dataset, args.model, args.chunk_size, args.epochs)
+    elif args.command == "train" and args.cv:
+        from model_selection import train_with_cv
+        train_with_cv(args.dataset, args.model, args.cv, args.workers, latency_weight=args.latency_weight)
+    elif args.command == "train":
+        train_models(args.dataset, args.model)
+    elif args.command == "export":
+        numpy_path = export_artifact(args.model, load_artifact(args.model, feature_layout()))
+        if numpy_path:
+            print(f"NumPy model saved to: {numpy_path}")
+    elif args.command == "score":
+        load_model(args.model)
+        num_rows = score_feature_file(args.features, args.out)
+        print(f"Scored {num_rows} rows -> {args.out}")
+    else:
+        load_model(getattr(args, "model", None))
+        predict_example(getattr(args, "user", 5))
 
-plot_radar_chart(list(my_prediction.values()), domains, title="Your Domain Prediction")
-explain_prediction(list(my_prediction.values()), domains)
\ No newline at end of file
+if __name__ == "__main__":
+    cli()
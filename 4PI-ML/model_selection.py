@@ -0,0 +1,138 @@
+# Model selection harness: k-fold CV of all candidates in a process pool, with cost metrics.
+# Run from the repository root:
+#   python 4PI-ML/model_selection.py --folds 5 --workers 4 --latency-weight 0.001 --save
+import argparse
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import KFold
+from sklearn.metrics import accuracy_score, f1_score
+
+from main import build_models, load_dataset, feature_layout, DATASET_PATH, MODEL_PATH
+from model_store import save_artifact, dataset_sha256
+
+# =========================
+# CONFIGURATION
+# =========================
+NUM_FOLDS = 5
+LATENCY_ROWS = 1000  # predict latency is reported per this many rows
+
+_X = None
+_y = None
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+def evaluate_fold(job):
+    """Fit one candidate on one fold and measure quality and inference cost."""
+    name, fold, train_idx, test_idx, n_jobs, estimator_n_jobs = job
+    model = build_models(n_jobs, estimator_n_jobs)[name]
+
+    start = time.perf_counter()
+    model.fit(_X[train_idx], _y[train_idx])
+    fit_time = time.perf_counter() - start
+
+    y_pred = model.predict(_X[test_idx])
+
+    latency_rows = np.resize(_X[test_idx], (LATENCY_ROWS, _X.shape[1]))
+    start = time.perf_counter()
+    model.predict_proba(latency_rows)
+    predict_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "model": name,
+        "fold": fold,
+        "fit_time_s": fit_time,
+        "predict_ms_per_1k": predict_ms * 1000 / LATENCY_ROWS,
+        "model_size_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "accuracy": accuracy_score(_y[test_idx], y_pred),
+        "f1": f1_score(_y[test_idx], y_pred, average="micro"),
+    }
+
+def cross_validate_models(X, y, folds=NUM_FOLDS, workers=1, n_jobs=None, estimator_n_jobs=None):
+    """
+    Run every (candidate, fold) pair, in a process pool when workers > 1, and
+    return per-candidate means of the recorded metrics.
+    """
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X))
+    jobs = [
+        (name, fold, train_idx, test_idx, n_jobs, estimator_n_jobs)
+        for name in build_models()
+        for fold, (train_idx, test_idx) in enumerate(splits)
+    ]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+            fold_results = list(pool.map(evaluate_fold, jobs))
+    else:
+        _init_worker(X, y)
+        fold_results = [evaluate_fold(job) for job in jobs]
+
+    summary = {}
+    for name in build_models():
+        rows = [r for r in fold_results if r["model"] == name]
+        summary[name] = {
+            key: float(np.mean([r[key] for r in rows]))
+            for key in ("fit_time_s", "predict_ms_per_1k", "model_size_bytes", "accuracy", "f1")
+        }
+        summary[name]["f1_std"] = float(np.std([r["f1"] for r in rows]))
+    return summary
+
+def select_best(summary, latency_weight=0.0, size_weight=0.0):
+    """
+    Pick the candidate maximising f1 - latency_weight * predict_ms_per_1k
+    - size_weight * model size in MB. Zero weights select on F1 alone.
+    """
+    def utility(name):
+        r = summary[name]
+        return r["f1"] - latency_weight * r["predict_ms_per_1k"] - size_weight * r["model_size_bytes"] / 1e6
+
+    return max(summary, key=utility)
+
+def print_summary(summary):
+    print(f"\n{'model':<20} {'F1':>6} {'+/-':>6} {'acc':>6} {'fit s':>7} {'ms/1k':>7} {'size KB':>9}")
+    for name, r in summary.items():
+        print(f"{name:<20} {r['f1']:>6.3f} {r['f1_std']:>6.3f} {r['accuracy']:>6.3f} "
+              f"{r['fit_time_s']:>7.2f} {r['predict_ms_per_1k']:>7.2f} {r['model_size_bytes'] / 1024:>9.1f}")
+
+def train_with_cv(dataset_path=DATASET_PATH, model_path=MODEL_PATH, folds=NUM_FOLDS, workers=1,
+                  n_jobs=None, estimator_n_jobs=None, latency_weight=0.0, size_weight=0.0):
+    """Cross-validate all candidates, refit the selected one on all rows and save it."""
+    X, y = load_dataset(dataset_path)
+    summary = cross_validate_models(X, y, folds, workers, n_jobs, estimator_n_jobs)
+    print_summary(summary)
+
+    best_model_name = select_best(summary, latency_weight, size_weight)
+    print(f"\nBest model selected: {best_model_name}")
+
+    best_model = build_models(n_jobs, estimator_n_jobs)[best_model_name]
+    best_model.fit(X, y)
+    artifact = save_artifact(model_path, best_model, best_model_name, summary,
+                             feature_layout(), dataset_sha256(dataset_path))
+    print(f"Model artifact saved to: {model_path}")
+    return artifact
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated 4PI model comparison")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--folds", type=int, default=NUM_FOLDS)
+    parser.add_argument("--workers", type=int, default=1, help="processes running (candidate, fold) jobs")
+    parser.add_argument("--n-jobs", type=int, default=None, help="MultiOutputClassifier n_jobs (per output)")
+    parser.add_argument("--estimator-n-jobs", type=int, default=None, help="RandomForest n_jobs (per tree)")
+    parser.add_argument("--latency-weight", type=float, default=0.0, help="F1 penalty per ms of predict time per 1k rows")
+    parser.add_argument("--size-weight", type=float, default=0.0, help="F1 penalty per MB of pickled model")
+    parser.add_argument("--save", action="store_true", help="refit the selected model on all rows and save it")
+    args = parser.parse_args()
+
+    if args.save:
+        train_with_cv(args.dataset, args.model, args.folds, args.workers, args.n_jobs,
+                      args.estimator_n_jobs, args.latency_weight, args.size_weight)
+    else:
+        X, y = load_dataset(args.dataset)
+        summary = cross_validate_models(X, y, args.folds, args.workers, args.n_jobs, args.estimator_n_jobs)
+        print_summary(summary)
+        print(f"\nBest model selected: {select_best(summary, args.latency_weight, args.size_weight)}")
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from numpy_model import export_model, save_numpy_model
+
+# Bump whenever the artifact dictionary changes shape
+ARTIFACT_VERSION = 1
+MANIFEST_FILE = "manifest.json"  # written by dataset/gen_data.py next to its parts
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def dataset_parts(path):
+    """
+    (X, y) .npy paths of a part directory written by dataset/gen_data.py, in
+    order. The part count comes from manifest.json, so files left over from
+    an earlier, larger run in the same directory are never picked up.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"{path} has no {MANIFEST_FILE}; regenerate it with dataset/gen_data.py")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        num_parts = json.load(f)["parts"]
+
+    parts = []
+    for part in range(num_parts):
+        x_path = os.path.join(path, f"part-{part:05d}-X.npy")
+        y_path = os.path.join(path, f"part-{part:05d}-y.npy")
+        if not (os.path.exists(x_path) and os.path.exists(y_path)):
+            raise ValueError(f"{path} is missing part {part} listed in {MANIFEST_FILE}")
+        parts.append((x_path, y_path))
+    return parts
+
+def dataset_sha256(path):
+    """
+    Hash of a dataset file, or of the manifest and the parts it lists in a
+    part directory written by dataset/gen_data.py.
+    """
+    if not os.path.isdir(path):
+        return file_sha256(path)
+
+    files = [p for pair in dataset_parts(path) for p in pair] + [os.path.join(path, MANIFEST_FILE)]
+    digest = hashlib.sha256()
+    for file_path in files:
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        digest.update(file_sha256(file_path).encode("ascii"))
+    return digest.hexdigest()
+
+def save_artifact(path, model, model_name, metrics, layout, dataset_hash):
+    """
+    Persist a trained model together with everything needed to check that it
+    still matches the feature layout used at inference time.
+    """
+    artifact = {
+        "artifact_version": ARTIFACT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model_name": model_name,
+        "model": model,
+        "metrics": metrics,
+        "layout": layout,
+        "dataset_sha256": dataset_hash,
+    }
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    export_artifact(path, artifact)
+    return artifact
+
+def export_artifact(path, artifact):
+    """
+    Write the NumPy-only export of an artifact next to its pickle, so
+    inference can skip sklearn. Returns the export path, or None when the
+    model type cannot be exported.
+    """
+    numpy_path = numpy_model_path(path)
+    try:
+        arrays = export_model(artifact["model"])
+    except ValueError as e:
+        print(f"No NumPy export for {artifact['model_name']}: {e}")
+        if os.path.exists(numpy_path):
+            os.remove(numpy_path)  # never leave an export of an older model behind
+        return None
+
+    meta = {k: v for k, v in artifact.items() if k != "model"}
+    save_numpy_model(numpy_path, arrays, meta)
+    return numpy_path
+
+def numpy_model_path(path):
+    return os.path.splitext(path)[0] + ".npz"
+
+def load_artifact(path, expected_layout):
+    """
+    Load a model artifact, failing fast if it was written by another artifact
+    version or for a different domains/phases/phase_weights layout.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No model artifact at {path}. Run `python 4PI-ML/main.py train` first.")
+
+    with open(path, "rb") as f:
+        artifact = pickle.load(f)
+
+    version = artifact.get("artifact_version")
+    if version != ARTIFACT_VERSION:
+        raise ValueError(f"Model artifact version {version} is not supported (expected {ARTIFACT_VERSION})")
+
+    if artifact["layout"] != expected_layout:
+        raise ValueError(
+            f"Feature layout of {path} does not match the current configuration. "
+            "Retrain with `python 4PI-ML/main.py train`."
+        )
+
+    return artifact
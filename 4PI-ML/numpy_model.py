@@ -0,0 +1,203 @@
+# Dependency-light inference: trained models flattened to plain NumPy arrays.
+# Evaluating an exported model needs only NumPy; sklearn is touched only by
+# export_model, which reads attributes of an already fitted estimator.
+import json
+import math
+import os
+
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+EXPORT_VERSION = 1
+ROW_CHUNK = 4096  # rows traversed at once through every tree of a forest
+
+def expit(x, exact=True):
+    """
+    Logistic function. exact=True (the default) gives sklearn's probabilities
+    bit for bit: scipy.special.expit, which sklearn itself uses, when scipy
+    is installed, otherwise the C library exp one value at a time (slow).
+    exact=False opts into NumPy's SIMD exp, which can differ in the last bit.
+    """
+    if not exact:
+        return 1.0 / (1.0 + np.exp(-x))
+    try:
+        from scipy.special import expit as scipy_expit
+    except ImportError:
+        e = np.fromiter(map(math.exp, (-x).ravel().tolist()), dtype=np.float64, count=x.size).reshape(x.shape)
+        return 1.0 / (1.0 + e)
+    return scipy_expit(x)
+
+# =========================
+# EXPORT
+# =========================
+def export_model(model):
+    """
+    Flatten a fitted MultiOutputClassifier of LogisticRegression (or log-loss
+    SGDClassifier) or RandomForestClassifier outputs into named arrays.
+    """
+    estimators = model.estimators_
+    first = estimators[0]
+
+    if hasattr(first, "coef_"):
+        if getattr(first, "loss", "log_loss") != "log_loss":
+            raise ValueError(f"Cannot export {type(first).__name__} with loss={first.loss}")
+        return {
+            "coef": np.column_stack([e.coef_[0] for e in estimators]),  # (features, outputs)
+            "intercept": np.array([e.intercept_[0] for e in estimators]),
+        }
+
+    if hasattr(first, "estimators_") and hasattr(first.estimators_[0], "tree_"):
+        arrays = {}
+        for d, forest in enumerate(estimators):
+            arrays.update({f"out{d}_{k}": v for k, v in _flatten_forest(forest).items()})
+        return arrays
+
+    raise ValueError(f"Cannot export {type(first).__name__} to the NumPy format")
+
+def _flatten_forest(forest):
+    """
+    Concatenate every tree into global node arrays with children as global
+    node ids. Leaves point to themselves, which is how evaluators spot them.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in (e.tree_ for e in forest.estimators_):
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(value / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.intp),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts).astype(np.intp),
+        "right": np.concatenate(rights).astype(np.intp),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.intp),
+    }
+
+# =========================
+# EVALUATORS
+# =========================
+class NumpyLogistic:
+    def __init__(self, arrays, exact=True):
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.exact = exact
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        proba = []
+        for d in range(self.coef.shape[1]):
+            # (16, 1) column like sklearn's coef_.T keeps the BLAS call identical
+            decision = (X @ np.ascontiguousarray(self.coef[:, d:d + 1]) + self.intercept[d:d + 1]).reshape(-1)
+            p = expit(decision, self.exact)
+            proba.append(np.stack([1 - p, p], axis=1))
+        return proba
+
+FOREST_KEYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+def forest_lookup_arrays(arrays):
+    """
+    Node lookup tables NumpyForest derives from the exported arrays. A host
+    that publishes them too (see shared_model.py) lets attached evaluators
+    skip building private copies.
+    """
+    lookups = {}
+    d = 0
+    while f"out{d}_roots" in arrays:
+        left = arrays[f"out{d}_left"]
+        lookups[f"out{d}_is_leaf"] = left == np.arange(left.size)
+        lookups[f"out{d}_children"] = np.column_stack([arrays[f"out{d}_right"], left])  # indexed by go_left
+        d += 1
+    return lookups
+
+class NumpyForest:
+    def __init__(self, arrays):
+        if "out0_children" not in arrays:
+            arrays = dict(arrays, **forest_lookup_arrays(arrays))
+        self.outputs = []
+        d = 0
+        while f"out{d}_roots" in arrays:
+            forest = {k: arrays[f"out{d}_{k}"] for k in FOREST_KEYS + ("is_leaf", "children")}
+            self.outputs.append(forest)
+            d += 1
+
+    @staticmethod
+    def _forest_proba(forest, X):
+        # RandomForestClassifier predicts on float32 input
+        X = np.asarray(X, dtype=np.float32)
+        roots = forest["roots"]
+        proba = np.zeros((X.shape[0], forest["value"].shape[1]))
+
+        for start in range(0, X.shape[0], ROW_CHUNK):
+            X_chunk = X[start:start + ROW_CHUNK]
+            num_rows, num_features = X_chunk.shape
+            X_flat = X_chunk.ravel()
+
+            # One flat (row, tree) slot per path; only paths not yet on a leaf are stepped
+            node = np.tile(roots, num_rows)
+            row_base = np.repeat(np.arange(num_rows) * num_features, roots.size)
+            active = np.flatnonzero(~forest["is_leaf"][node])
+            while active.size:
+                current = node[active]
+                go_left = X_flat[row_base[active] + forest["feature"][current]] <= forest["threshold"][current]
+                node[active] = forest["children"][current, go_left.view(np.int8)]
+                active = active[~forest["is_leaf"][node[active]]]
+
+            # Accumulate tree by tree in order, as the forest does, for identical rounding
+            leaf = node.reshape(num_rows, roots.size)
+            acc = proba[start:start + ROW_CHUNK]
+            for t in range(roots.size):
+                acc += forest["value"][leaf[:, t]]
+
+        proba /= roots.size
+        return proba
+
+    def predict_proba(self, X):
+        return [self._forest_proba(forest, X) for forest in self.outputs]
+
+def model_from_arrays(arrays, exact=True):
+    if "coef" in arrays:
+        return NumpyLogistic(arrays, exact)
+    if "out0_roots" in arrays:
+        return NumpyForest(arrays)
+    raise ValueError("Unrecognised NumPy model arrays")
+
+# =========================
+# FILE FORMAT
+# =========================
+def save_numpy_model(path, arrays, meta):
+    """Write arrays plus a JSON metadata string to an .npz readable without pickle."""
+    meta = dict(meta, export_version=EXPORT_VERSION)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, __meta__=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_path, path)
+
+def load_numpy_model(path, expected_layout=None):
+    """Return (arrays, meta), checking the export version and feature layout."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files if k != "__meta__"}
+        meta = json.loads(str(data["__meta__"]))
+
+    if meta.get("export_version") != EXPORT_VERSION:
+        raise ValueError(f"NumPy model version {meta.get('export_version')} is not supported (expected {EXPORT_VERSION})")
+    if expected_layout is not None and meta["layout"] != expected_layout:
+        raise ValueError(
+            f"Feature layout of {path} does not match the current configuration. "
+            "Retrain with `python 4PI-ML/main.py train`."
+        )
+    return arrays, meta
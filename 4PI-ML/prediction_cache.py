@@ -0,0 +1,149 @@
+# Bounded LRU memo of model outputs keyed by the canonical feature row.
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 65536
+
+def model_token(path):
+    """Identity of a model artifact on disk; changes whenever the file is rewritten."""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def row_keys(features):
+    """
+    Contiguous float64 copy of `features` and one bytes-comparable key per
+    row. Answer order is already folded into the 16 feature cells, so every
+    permutation of the same answers shares a key. Phase-weight sums are
+    small integers and get 16-byte uint8 keys; any other matrix falls back
+    to its float64 bytes (a different key length, so the two never collide).
+    """
+    X = np.ascontiguousarray(features, dtype=np.float64)
+    if X.ndim != 2:
+        raise ValueError(f"Expected a 2-D feature matrix, got shape {X.shape}")
+    compact = X.astype(np.uint8)
+    keys = compact if np.array_equal(compact, X) else X
+    return X, keys.view(np.dtype((np.void, keys.shape[1] * keys.itemsize))).ravel()
+
+class PredictionCache:
+    """
+    LRU cache in front of a batch scoring function. Each batch is deduped
+    with np.unique, only rows missing from the cache reach the model, and
+    results are scattered back to the original row order.
+
+    Cached outputs live in one preallocated (max_entries, width) array;
+    `slots` maps each key to its row there in LRU order, so a batch of hits
+    is gathered with a single fancy index.
+
+    bind() ties the entries to one model artifact; binding a different
+    token (a new path, or the same file rewritten) empties the cache.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.slots = OrderedDict()
+        self.values = None
+        self.token = None
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.rows = self.model_rows = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def bind(self, token):
+        with self.lock:
+            if token != self.token:
+                if self.slots:
+                    self.invalidations += 1
+                self._clear()
+                self.token = token
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        self.slots.clear()
+        self.values = None
+
+    def _insert(self, keys, scores):
+        if self.values is None or self.values.shape != (self.max_entries, scores.shape[1]):
+            self._clear()
+            self.values = np.empty((self.max_entries, scores.shape[1]), dtype=scores.dtype)
+        slots = []
+        for key in keys:
+            slot = self.slots.get(key)
+            if slot is not None:
+                # another thread missed the same row and inserted it first
+                self.slots.move_to_end(key)
+            elif len(self.slots) < self.max_entries:
+                slot = len(self.slots)
+            else:
+                _, slot = self.slots.popitem(last=False)
+                self.evictions += 1
+            self.slots[key] = slot
+            slots.append(slot)
+        # a batch larger than the cache reuses slots; the last write wins, like the dict
+        self.values[slots] = scores
+
+    def predict(self, features, score_fn):
+        """score_fn(features) for an (N, 16) matrix, reusing cached rows."""
+        X, keys = row_keys(features)
+        if self.max_entries <= 0 or len(X) == 0:
+            return score_fn(X)
+
+        unique_keys, first_row, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique_keys = unique_keys.tolist()
+        with self.lock:
+            token = self.token
+            get, touch = self.slots.get, self.slots.move_to_end
+            slots = []
+            for key in unique_keys:
+                slot = get(key)
+                if slot is None:
+                    slots.append(-1)
+                else:
+                    touch(key)
+                    slots.append(slot)
+            slots = np.array(slots, dtype=np.intp)
+            hit = slots >= 0
+            cached = self.values[slots[hit]] if hit.any() else None
+
+        missing = np.flatnonzero(~hit)
+        scores = np.asarray(score_fn(X[first_row[missing]])) if len(missing) else None
+        width = scores.shape[1] if scores is not None else cached.shape[1]
+        dtype = scores.dtype if scores is not None else cached.dtype
+        out = np.empty((len(unique_keys), width), dtype=dtype)
+        if cached is not None:
+            out[hit] = cached
+        if scores is not None:
+            out[missing] = scores
+
+        with self.lock:
+            self.rows += len(X)
+            self.model_rows += len(missing)
+            self.hits += len(unique_keys) - len(missing)
+            self.misses += len(missing)
+            # rows scored by a model that was replaced meanwhile are not cached
+            if len(missing) and self.token == token:
+                self._insert([unique_keys[i] for i in missing], scores)
+
+        return out[inverse.ravel()]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.slots),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "rows": self.rows,
+                "model_rows": self.model_rows
+            }
@@ -0,0 +1,11 @@
+# Makes the shared questions/ library (registry, analytics, instrumentation)
+# importable: `import questions_path` before them. This is the only module that
+# puts questions/ on sys.path; scripts outside the 4PI-ML root (dataset/gen_data.py,
+# questions_puller/main.py) load this file by path instead of repeating it.
+import os
+import sys
+
+QUESTIONS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "questions"))
+
+if QUESTIONS_DIR not in sys.path:
+    sys.path.append(QUESTIONS_DIR)
@@ -0,0 +1,116 @@
+# Batch radar-chart reports: one reusable figure per process, fanned out over a process pool.
+# Run from the repository root:
+#   python 4PI-ML/report.py --out-dir 4PI-ML/reports --workers 4
+#   python 4PI-ML/report.py --scores scores.npy --names names.txt --format svg --out-dir 4PI-ML/reports
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from main import domains
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+REPORT_DIR = "4PI-ML/reports"
+FORMATS = ["png", "svg"]
+CHUNK_SIZE = 64  # charts per pool task
+
+class RadarRenderer:
+    """
+    Builds the polar axes, labels and artists once; render() only swaps the
+    line/fill data and title before saving.
+    """
+    def __init__(self, labels=domains, fmt="png", dpi=100):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.fmt = fmt
+        self.dpi = dpi
+        self.angles = np.append(np.linspace(0, 2 * np.pi, len(labels), endpoint=False), 0)
+
+        self.fig = Figure(figsize=(6, 6))
+        FigureCanvasAgg(self.fig)
+        ax = self.fig.add_subplot(polar=True)
+        zeros = np.zeros_like(self.angles)
+        self.line, = ax.plot(self.angles, zeros, 'o-', linewidth=2)
+        self.fill, = ax.fill(self.angles, zeros, alpha=0.25)
+        ax.set_thetagrids(np.degrees(self.angles[:-1]), labels)
+        ax.set_ylim(0, 1)
+        self.title = ax.set_title("")
+
+    def render(self, scores, path, title="Domain Prediction"):
+        closed = np.append(scores, scores[0])
+        self.line.set_ydata(closed)
+        self.fill.set_xy(np.column_stack([self.angles, closed]))
+        self.title.set_text(title)
+        self.fig.savefig(path, format=self.fmt, dpi=self.dpi)
+        return path
+
+_renderer = None
+
+def _init_worker(fmt, dpi):
+    global _renderer
+    _renderer = RadarRenderer(fmt=fmt, dpi=dpi)
+
+def _render_chunk(jobs):
+    return [_renderer.render(scores, path, title) for scores, path, title in jobs]
+
+def safe_filename(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name.strip()) or "user"
+
+def render_batch(scores, names, out_dir=REPORT_DIR, workers=1, fmt="png", dpi=100, chunk_size=CHUNK_SIZE):
+    """
+    Render one chart per row of `scores` to out_dir/<index>_<name>.<fmt>
+    and return the written paths in input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [
+        (row, os.path.join(out_dir, f"{i:06d}_{safe_filename(name)}.{fmt}"), f"{name} – Domain Prediction")
+        for i, (row, name) in enumerate(zip(np.asarray(scores), names))
+    ]
+    chunks = [jobs[start:start + chunk_size] for start in range(0, len(jobs), chunk_size)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fmt, dpi)) as pool:
+            return [path for chunk_paths in pool.map(_render_chunk, chunks) for path in chunk_paths]
+
+    _init_worker(fmt, dpi)
+    return [path for chunk in chunks for path in _render_chunk(chunk)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render one radar chart per respondent")
+    parser.add_argument("--scores", help="(N, 4) .npy from `main.py score`; default scores 4PI.csv")
+    parser.add_argument("--names", help="names file from convert_export.py --names")
+    parser.add_argument("--out-dir", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", choices=FORMATS, default="png", help="svg skips rasterisation")
+    parser.add_argument("--dpi", type=int, default=100)
+    instrumentation.add_profile_arguments(parser, "4PI-ML/report.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        if args.scores:
+            scores = np.load(args.scores, mmap_mode="r")
+            if args.names:
+                with open(args.names, encoding="utf-8") as f:
+                    names = [line.rstrip("\n") for line in f]
+            else:
+                names = [f"user{i}" for i in range(len(scores))]
+        else:
+            from main import predict_batch
+            from simulate_user import load_user_records
+
+            records = load_user_records()
+            scores = predict_batch(records)
+            names = [r[0] for r in records]
+
+        start = time.perf_counter()
+        paths = render_batch(scores, names, args.out_dir, args.workers, args.format, args.dpi)
+        elapsed = time.perf_counter() - start
+        print(f"Rendered {len(paths)} charts to {args.out_dir} in {elapsed:.2f}s "
+              f"({elapsed / max(len(paths), 1) * 1000:.1f}ms each)")
@@ -0,0 +1,84 @@
+# Closed-form predictor for the top-2 domain labelling rule of dataset/gen_data.py.
+import numpy as np
+
+from main import NUM_DOMAINS, NUM_PHASES, get_model, predict_features
+
+# =========================
+# CONFIGURATION
+# =========================
+TEMPERATURE = 1.0  # margin (in phase-weight points) that moves the probability by one logit
+AMBIGUITY_MARGIN = 2.0  # rerank rows whose 2nd/3rd domain gap is below this many points
+ENGINES = ["rule", "ml", "rerank"]
+
+class RuleEngine:
+    """
+    Features already carry the phase weights, so domain scores are one
+    (N, 16) @ (16, 4) product. predict/predict_proba mirror MultiOutputClassifier.
+    """
+    def __init__(self, temperature=TEMPERATURE):
+        self.temperature = temperature
+        self.weights = np.zeros((NUM_DOMAINS * NUM_PHASES, NUM_DOMAINS))
+        for phase_idx in range(NUM_PHASES):
+            for domain_idx in range(NUM_DOMAINS):
+                self.weights[phase_idx * NUM_DOMAINS + domain_idx, domain_idx] = 1
+
+    def domain_scores(self, X):
+        return np.asarray(X, dtype=float) @ self.weights
+
+    def margins(self, X):
+        """
+        Signed distance of each domain from the top-2 boundary, halfway
+        between the 2nd and 3rd ranked domains. Ties go to the higher domain
+        index like generate_target_domains, so no margin is ever zero.
+        """
+        return self.score_margins(self.domain_scores(X))
+
+    def score_margins(self, domain_scores):
+        """margins() from (N, 4) domain scores, e.g. totals kept by live_scoring."""
+        rank_key = np.rint(domain_scores) * NUM_DOMAINS + np.arange(NUM_DOMAINS)
+        ordered = np.sort(rank_key, axis=1)
+        boundary = (ordered[:, -2] + ordered[:, -3]) / 2
+        return (rank_key - boundary[:, None]) / NUM_DOMAINS
+
+    def predict_scores(self, X):
+        """(N, 4) probability that each domain is in the top 2."""
+        return 1 / (1 + np.exp(-self.margins(X) / self.temperature))
+
+    def predict(self, X):
+        return (self.margins(X) > 0).astype(int)
+
+    def predict_proba(self, X):
+        scores = self.predict_scores(X)
+        return [np.column_stack([1 - scores[:, d], scores[:, d]]) for d in range(NUM_DOMAINS)]
+
+def rerank_scores(X, rule_engine, model, ambiguity_margin=AMBIGUITY_MARGIN, score_fn=None):
+    """
+    Rule engine first; the ML model is only consulted for rows whose top-2
+    boundary is closer than `ambiguity_margin` points and replaces the rule
+    probabilities there. `score_fn` ((N, 16) -> (N, 4)) replaces
+    model.predict_proba, e.g. main.predict_features and its cache.
+    """
+    margins = rule_engine.margins(X)
+    scores = 1 / (1 + np.exp(-margins / rule_engine.temperature))
+    # the domains closest to the boundary sit half the 2nd/3rd gap away from it
+    gap = 2 * np.abs(margins).min(axis=1)
+    ambiguous = gap < ambiguity_margin
+    if ambiguous.any():
+        if score_fn is not None:
+            scores[ambiguous] = score_fn(np.asarray(X)[ambiguous])
+        else:
+            ml_proba = model.predict_proba(np.asarray(X)[ambiguous])
+            scores[ambiguous] = np.column_stack([p[:, 1] for p in ml_proba])
+    return scores
+
+_rule_engine = RuleEngine()
+
+def score_features(X, engine="rule"):
+    """(N, 4) domain probabilities from the rule engine, the trained model, or both."""
+    if engine == "rule":
+        return _rule_engine.predict_scores(X)
+    if engine == "rerank":
+        return rerank_scores(X, _rule_engine, get_model(), score_fn=predict_features)
+    if engine == "ml":
+        return predict_features(X)
+    raise ValueError(f"Unknown engine: {engine} (expected one of {ENGINES})")
@@ -0,0 +1,225 @@
+# Long-running scoring service: keeps the model warm and micro-batches requests.
+# Run from the repository root after `python 4PI-ML/main.py train`:
+#   python 4PI-ML/serve.py --port 8040 --window-ms 2
+#
+#   POST /score    {"answers": [[domain_idx, phase_idx], ...]}  -> {"scores": {domain: prob}}
+#   GET  /metrics  latency percentiles, throughput and batch counters
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from main import domains, load_model, predict_batch, records_to_answers, records_to_features, prediction_cache
+from rule_engine import score_features, ENGINES
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+DEFAULT_PORT = 8040
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 512
+LATENCY_SAMPLES = 10000  # recent requests kept for percentiles
+
+# =========================
+# METRICS
+# =========================
+class ServiceStats:
+    def __init__(self, max_samples=LATENCY_SAMPLES):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=max_samples)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+
+    def record_batch(self, latencies):
+        with self.lock:
+            self.batches += 1
+            self.requests += len(latencies)
+            self.latencies.extend(latencies)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            uptime = time.perf_counter() - self.started
+            requests, batches, errors = self.requests, self.batches, self.errors
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies.size else (0.0, 0.0)
+        return {
+            "requests": requests,
+            "errors": errors,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "uptime_s": uptime,
+            "throughput_rps": requests / uptime if uptime else 0.0,
+            "latency_p50_ms": float(p50),
+            "latency_p99_ms": float(p99),
+        }
+
+# =========================
+# MICRO-BATCHING
+# =========================
+class _Pending:
+    __slots__ = ("answers", "received", "done", "scores", "error")
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.received = time.perf_counter()
+        self.done = threading.Event()
+        self.scores = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `window_ms` (or `max_batch` items)
+    and scores them with a single predict_batch call on a worker thread.
+    """
+    def __init__(self, score_fn=predict_batch, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch=DEFAULT_MAX_BATCH, stats=None):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats or ServiceStats()
+        self.pending = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, answers):
+        item = _Pending(answers)
+        self.pending.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.scores
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_group(self, group):
+        try:
+            scores = self.score_fn(np.stack([item.answers for item in group]))
+            for item, row in zip(group, scores):
+                item.scores = row
+        except Exception as e:
+            for item in group:
+                item.error = e
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # forms of different lengths cannot share one (N, Q, 2) array
+            groups = {}
+            for item in batch:
+                groups.setdefault(item.answers.shape, []).append(item)
+            for group in groups.values():
+                self._score_group(group)
+
+            finished = time.perf_counter()
+            for item in batch:
+                item.done.set()
+            self.stats.record_batch([finished - item.received for item in batch])
+
+# =========================
+# HTTP SERVER
+# =========================
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for load generators
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    batcher = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, dict(self.batcher.stats.snapshot(), prediction_cache=prediction_cache.stats()))
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            # Validate per request so one bad payload cannot fail a whole batch
+            if not payload["answers"]:
+                raise ValueError("No answers given")
+            answers = records_to_answers([payload["answers"]])[0]
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            self.batcher.stats.record_error()
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            scores = self.batcher.submit(answers)
+        except Exception as e:
+            self.batcher.stats.record_error()
+            self._send_json(500, {"error": f"Scoring failed: {e}"})
+            return
+        self._send_json(200, {"scores": dict(zip(domains, scores.tolist()))})
+
+    def log_message(self, format, *args):
+        pass
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 resets bursts of concurrent clients
+
+def serve(port=DEFAULT_PORT, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, model_path=None,
+          engine="rule"):
+    if engine != "rule":
+        load_model(model_path)  # keep the model resident before accepting traffic
+    score_fn = predict_batch if engine == "ml" else lambda answers: score_features(records_to_features(answers), engine)
+    ScoringHandler.batcher = MicroBatcher(score_fn, window_ms=window_ms, max_batch=max_batch)
+    server = ScoringServer(("127.0.0.1", port), ScoringHandler)
+    print(f"Scoring on http://127.0.0.1:{port} (engine={engine}, window={window_ms}ms, max_batch={max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(ScoringHandler.batcher.stats.snapshot(), indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="4PI scoring service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="how long to wait for more requests before scoring a batch (0 = only what is already queued)")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--model", help=".npz export or .pkl artifact (default: export if present)")
+    parser.add_argument("--engine", choices=ENGINES, default="rule",
+                        help="rule: closed-form top-2 rule, ml: trained model, rerank: rule with ML on ambiguous rows")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/serve.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        serve(args.port, args.window_ms, args.max_batch, args.model, args.engine)
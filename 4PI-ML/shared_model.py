@@ -0,0 +1,264 @@
+# Host the NumPy model export in one read-only memory-mapped segment shared by all scoring workers.
+# Run from the repository root after `python 4PI-ML/main.py train`:
+#   python 4PI-ML/shared_model.py publish
+#   python 4PI-ML/shared_model.py score features.npy scores.npy --workers 4
+#   python 4PI-ML/shared_model.py bench --rows 200000 --max-workers 4
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from main import NUM_DOMAINS, NUMPY_MODEL_PATH, feature_layout, records_to_features
+from numpy_model import forest_lookup_arrays, load_numpy_model, model_from_arrays
+from prediction_cache import model_token
+import instrumentation
+
+# =========================
+# CONFIGURATION
+# =========================
+SEGMENT_PATH = os.path.splitext(NUMPY_MODEL_PATH)[0] + ".seg"
+SEGMENT_MAGIC = b"4PISEG01"
+SEGMENT_VERSION = 1
+ALIGN = 64  # byte alignment of every array in the segment
+CHUNK_SIZE = 20000
+MODES = ["shared", "copy"]
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+# =========================
+# SEGMENT
+# =========================
+def publish(model_path=NUMPY_MODEL_PATH, segment_path=SEGMENT_PATH):
+    """
+    Write the arrays of a NumPy model export, plus the lookup tables the
+    evaluator would otherwise derive, into one flat file:
+
+      magic | header length | JSON header | padding | arrays, 64-byte aligned
+
+    The header records each array's dtype, shape and offset. The file is
+    written beside the target and renamed into place, so workers still
+    mapping an older segment keep a consistent view.
+    """
+    arrays, meta = load_numpy_model(model_path, feature_layout())
+    arrays.update(forest_lookup_arrays(arrays))
+
+    entries, offset = {}, 0
+    for key, array in arrays.items():
+        entries[key] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({
+        "version": SEGMENT_VERSION,
+        "meta": meta,
+        "source": list(model_token(model_path)),
+        "arrays": entries
+    }).encode("utf-8")
+    data_start = _aligned(len(SEGMENT_MAGIC) + 8 + len(header))
+
+    tmp_path = segment_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SEGMENT_MAGIC + len(header).to_bytes(8, "little") + header)
+        for key, array in arrays.items():
+            f.seek(data_start + entries[key]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, segment_path)
+    return segment_path
+
+def read_header(segment_path):
+    with open(segment_path, "rb") as f:
+        if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise ValueError(f"{segment_path} is not a model segment")
+        size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(size).decode("utf-8"))
+    if header.get("version") != SEGMENT_VERSION:
+        raise ValueError(f"Model segment version {header.get('version')} is not supported (expected {SEGMENT_VERSION})")
+    header["data_start"] = _aligned(len(SEGMENT_MAGIC) + 8 + size)
+    return header
+
+def is_current(segment_path, model_path=NUMPY_MODEL_PATH):
+    """True when the segment exists and was published from the current export."""
+    if not os.path.exists(segment_path):
+        return False
+    try:
+        return read_header(segment_path)["source"] == list(model_token(model_path))
+    except (ValueError, OSError):
+        return False
+
+def ensure_published(model_path=NUMPY_MODEL_PATH, segment_path=SEGMENT_PATH):
+    if not is_current(segment_path, model_path):
+        publish(model_path, segment_path)
+    return segment_path
+
+def attach(segment_path=SEGMENT_PATH):
+    """
+    Return (arrays, meta) as read-only views into one shared mapping of the
+    segment: nothing is copied, and every process attached to the same file
+    shares its pages through the page cache.
+    """
+    header = read_header(segment_path)
+    if header["meta"].get("layout") != feature_layout():
+        raise ValueError(
+            f"Feature layout of {segment_path} does not match the current configuration. "
+            "Republish with `python 4PI-ML/shared_model.py publish`."
+        )
+    buffer = np.memmap(segment_path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for key, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        start = header["data_start"] + entry["offset"]
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        arrays[key] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(entry["shape"])
+    return arrays, header["meta"]
+
+def memory_usage():
+    """
+    Resident memory of this process in kB. pss_kb splits shared pages
+    between the processes mapping them, so it is the per-worker cost.
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss", "Pss_Anon", "Pss_File"):
+                    usage[name.lower() + "_kb"] = int(value.split()[0])
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage = {"rss_kb": peak, "pss_kb": peak}
+    return usage
+
+# =========================
+# WORKER POOL
+# =========================
+_worker_model = None
+
+def _init_worker(mode, path):
+    global _worker_model
+    if mode == "shared":
+        arrays, _ = attach(path)
+    else:
+        arrays, _ = load_numpy_model(path, feature_layout())
+    _worker_model = model_from_arrays(arrays)
+
+def _score_range(job):
+    features_path, out_path, start, stop = job
+    features = np.load(features_path, mmap_mode="r")
+    scores = np.load(out_path, mmap_mode="r+")
+    proba = _worker_model.predict_proba(np.asarray(features[start:stop], dtype=np.float64))
+    scores[start:stop] = np.column_stack([p[:, 1] for p in proba])
+    scores.flush()
+    return os.getpid(), memory_usage()
+
+@instrumentation.timed("shared_model.score_parallel")
+def score_parallel(features_path, out_path, workers=None, chunk_size=CHUNK_SIZE, mode="shared",
+                   model_path=NUMPY_MODEL_PATH, segment_path=SEGMENT_PATH):
+    """
+    Score a (N, 16) .npy feature matrix with a pool of worker processes and
+    write (N, 4) probabilities to `out_path`. Features and scores are
+    memory-mapped, so each job only carries a row range. mode="shared"
+    attaches every worker to the published segment; mode="copy" loads a
+    private copy of the export per worker, for comparison.
+
+    Returns (rows, {worker pid: memory_usage() after its last job}).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {MODES})")
+    path = ensure_published(model_path, segment_path) if mode == "shared" else model_path
+    workers = workers or os.cpu_count() or 1
+
+    num_rows = np.load(features_path, mmap_mode="r").shape[0]
+    scores = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float64, shape=(num_rows, NUM_DOMAINS))
+    del scores
+    jobs = [(features_path, out_path, start, min(start + chunk_size, num_rows))
+            for start in range(0, num_rows, chunk_size)]
+
+    usage = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mode, path)) as pool:
+        for pid, worker_usage in pool.map(_score_range, jobs):
+            usage[pid] = worker_usage
+    instrumentation.count("shared_model.rows_scored", num_rows)
+    return num_rows, usage
+
+# =========================
+# BENCHMARK
+# =========================
+def benchmark(num_rows=200_000, max_workers=None, chunk_size=CHUNK_SIZE, seed=None,
+              model_path=NUMPY_MODEL_PATH, segment_path=SEGMENT_PATH):
+    """Throughput and per-worker memory of both modes for 1..max_workers workers."""
+    max_workers = max_workers or os.cpu_count() or 1
+    rng = np.random.default_rng(seed)
+    answers = np.stack([rng.integers(0, NUM_DOMAINS, (num_rows, 15)),
+                        rng.integers(0, len(feature_layout()["phases"]), (num_rows, 15))], axis=-1)
+    ensure_published(model_path, segment_path)
+
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix="4pi_shared_")
+    try:
+        features_path = os.path.join(tmp_dir, "features.npy")
+        np.save(features_path, records_to_features(answers))
+        reference = None
+        for mode in MODES:
+            for workers in range(1, max_workers + 1):
+                out_path = os.path.join(tmp_dir, f"scores-{mode}-{workers}.npy")
+                start = time.perf_counter()
+                _, usage = score_parallel(features_path, out_path, workers, chunk_size, mode, model_path, segment_path)
+                elapsed = time.perf_counter() - start
+
+                scores = np.load(out_path)
+                if reference is None:
+                    reference = scores
+                results.append({
+                    "mode": mode,
+                    "workers": workers,
+                    "rows_per_s": num_rows / elapsed,
+                    "rss_kb": float(np.mean([u["rss_kb"] for u in usage.values()])),
+                    "pss_kb": float(np.mean([u["pss_kb"] for u in usage.values()])),
+                    "identical": bool(np.array_equal(scores, reference))
+                })
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory model hosting for multi-process scoring")
+    instrumentation.add_profile_arguments(parser, "4PI-ML/shared_model.prof")
+    parser.add_argument("--model", default=NUMPY_MODEL_PATH, help=".npz NumPy model export")
+    parser.add_argument("--segment", default=SEGMENT_PATH, help="memory-mapped segment file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("publish", help="write the model segment workers attach to")
+
+    p_score = sub.add_parser("score", help="score a .npy feature matrix with a worker pool")
+    p_score.add_argument("features", help="(N, 16) .npy feature file")
+    p_score.add_argument("out", help="destination .npy file for (N, 4) domain probabilities")
+    p_score.add_argument("--workers", type=int, default=None)
+    p_score.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    p_score.add_argument("--mode", choices=MODES, default="shared")
+
+    p_bench = sub.add_parser("bench", help="throughput and worker memory, shared vs private model copies")
+    p_bench.add_argument("--rows", type=int, default=200_000)
+    p_bench.add_argument("--max-workers", type=int, default=None)
+    p_bench.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    p_bench.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        if args.command == "publish":
+            path = publish(args.model, args.segment)
+            print(f"Model segment written to: {path} ({os.path.getsize(path)} bytes)")
+        elif args.command == "score":
+            num_rows, usage = score_parallel(args.features, args.out, args.workers, args.chunk_size,
+                                             args.mode, args.model, args.segment)
+            print(f"Scored {num_rows} rows with {len(usage)} workers -> {args.out}")
+        else:
+            print(f"\n{'mode':>7} {'workers':>8} {'rows/s':>12} {'RSS (MB)':>9} {'PSS (MB)':>9}")
+            for r in benchmark(args.rows, args.max_workers, args.chunk_size, args.seed, args.model, args.segment):
+                print(f"{r['mode']:>7} {r['workers']:>8} {r['rows_per_s']:>12.0f} {r['rss_kb'] / 1024:>9.1f} "
+                      f"{r['pss_kb'] / 1024:>9.1f}" + ("" if r["identical"] else "  (scores differ!)"))
@@ -1,6 +1,12 @@
 import random
 import csv
-import json
+import os
+
+import numpy as np
+
+import questions_path  # noqa: F401
+from registry import load_bank_file
+import instrumentation
 
 PHASE_ORDER = [
     "Curiosity Activation",
@@ -30,64 +36,122 @@ def simulate_user_response():
         record.append((domain_idx, phase_idx))
     return record
 
-def csv_row_to_ml_record(row):
+QUESTION_BANK_PATH = "questions_puller/pulled_questions.json"
+EXPORT_PATH = "4PI-ML/4PI.csv"
+
+
+def normalize_text(text):
+    return " ".join(text.split()).casefold()
+
+
+def option_domain_index(option):
+    """
+    Domain index of the first domain with score>0 (STEM when none scores).
+    """
+    for dom, score in option["domains"].items():
+        if score > 0:
+            return DOMAINS.index(DOMAIN_MAP[dom])
+    return 0
+
+
+class QuestionBankIndex:
+    """
+    Question bank parsed once and indexed for O(1) answer lookup.
+
+    questions[i] / phase_idx[i] / fallback_domain_idx[i] describe the i-th
+    question of the pulled form, and lookup maps
+    (question text, normalized option text) -> (domain_index, phase_index).
+    """
+
+    def __init__(self, question_bank):
+        unsupported = sorted({
+            dom for q in question_bank for opt in q["options"]
+            for dom, score in opt["domains"].items() if score > 0 and dom not in DOMAIN_MAP
+        })
+        if unsupported:
+            raise ValueError(f"Question bank uses domains 4PI-ML cannot score: {', '.join(unsupported)} "
+                             f"(expected {', '.join(DOMAIN_MAP)})")
+        self.questions = [q["question"].strip() for q in question_bank]
+        self.position = {text: i for i, text in enumerate(self.questions)}
+        self.phase_idx = np.array([PHASE_ORDER.index(q["interest_phase"]) for q in question_bank], dtype=np.intp)
+        self.fallback_domain_idx = np.array([option_domain_index(q["options"][0]) for q in question_bank], dtype=np.intp)
+
+        self.lookup = {}
+        for question_text, q, phase_idx in zip(self.questions, question_bank, self.phase_idx):
+            for opt in q["options"]:
+                key = (question_text, normalize_text(opt["text"]))
+                self.lookup[key] = (option_domain_index(opt), int(phase_idx))
+
+    def __len__(self):
+        return len(self.questions)
+
+    def answer(self, position, selected_text):
+        """(domain_index, phase_index) for an answer, or None if it matches no option."""
+        return self.lookup.get((self.questions[position], normalize_text(selected_text)))
+
+    def fallback(self, position):
+        return (int(self.fallback_domain_idx[position]), int(self.phase_idx[position]))
+
+
+_index_cache = {}
+_records_cache = {}
+
+
+def load_question_index(path=QUESTION_BANK_PATH):
+    """
+    Return the QuestionBankIndex for `path`, rebuilt only when the registry
+    reloads the file because it changed.
+    """
+    bank = load_bank_file(path)
+    cached = _index_cache.get(path)
+    if cached is None or cached[0] is not bank:
+        cached = (bank, QuestionBankIndex(bank.questions))
+        _index_cache[path] = cached
+    return cached[1]
+
+
+def csv_row_to_ml_record(row, index=None):
     """
     Convert a CSV row (Name + answers) into a list of (domain_index, phase_index) tuples
     by matching the answer text to the JSON option text.
     """
-    # Load question bank
-    with open("questions_puller/pulled_questions.json", "r", encoding="utf-8") as f:
-        question_bank = json.load(f)
-        question_lookup = {q["question"].strip(): q for q in question_bank}
+    if index is None:
+        index = load_question_index()
 
     my_answers = [row["Name"].strip()]
-    answer_texts = [row[q].strip() for q in row if q != "Name"]  # skip Name
+    answer_texts = [row[q] for q in row if q != "Name"]  # skip Name
 
     for i, selected_text in enumerate(answer_texts):
-        # Match question
-        question_text = list(question_lookup.keys())[i]
-        q = question_lookup[question_text]
-
-        # Find which option matches the answer text
-        option_found = None
-        for opt in q["options"]:
-            if opt["text"].strip() == selected_text.strip():
-                option_found = opt
-                break
-
-        if option_found is None:
+        answer = index.answer(i, selected_text)
+        if answer is None:
             # If no match, fallback to first option
-            print(f"⚠️ Answer not found for question: {question_text}, using first option")
-            option_found = q["options"][0]
+            print(f"⚠️ Answer not found for question: {index.questions[i]}, using first option")
+            answer = index.fallback(i)
+        my_answers.append(answer)
 
-        # Get domain index (first domain with score>0)
-        domain_name = None
-        for dom, score in option_found["domains"].items():
-            if score > 0:
-                domain_name = dom
-                break
-        if domain_name is None:
-            domain_idx = 0
-        else:
-            domain_idx = DOMAINS.index(DOMAIN_MAP[domain_name])
-
-        # Phase index
-        phase_idx = PHASE_ORDER.index(q["interest_phase"])
+    return my_answers
 
-        my_answers.append((domain_idx, phase_idx))
 
-    return my_answers
+def load_user_records(csv_file=EXPORT_PATH):
+    """
+    Convert every row of the survey export in one pass, cached by the
+    export's mtime and the question bank index the answers were mapped with.
+    """
+    mtime = os.path.getmtime(csv_file)
+    index = load_question_index()
+    cached = _records_cache.get(csv_file)
+    if cached is None or cached[0] != mtime or cached[1] is not index:
+        with instrumentation.timer("simulate_user.parse_export"):
+            with open(csv_file, newline="", encoding="utf-8") as f:
+                records = [csv_row_to_ml_record(row, index) for row in csv.DictReader(f)]
+        instrumentation.count("simulate_user.export_rows", len(records))
+        cached = (mtime, index, records)
+        _records_cache[csv_file] = cached
+    return cached[2]
 
 
 def real_user_response(userIndex):
-    csv_file = "4PI-ML/4PI.csv"
-    records = []
-    with open(csv_file, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            record = csv_row_to_ml_record(row)
-            records.append(record)
-    return records[userIndex]
+    return load_user_records()[userIndex]
 
 
 # Example usage
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+ML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+REPO_ROOT = os.path.join(ML_DIR, os.pardir)
+sys.path.insert(0, ML_DIR)
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """The 4PI-ML modules resolve their default paths from the repository root."""
+    monkeypatch.chdir(REPO_ROOT)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from convert_export import convert_export
+from main import records_to_features
+from simulate_user import load_user_records
+
+def test_empty_export_is_rejected_before_writing(tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_text("")
+    out_path = tmp_path / "features.npy"
+    with pytest.raises(ValueError, match="header"):
+        convert_export(str(csv_path), str(out_path))
+    assert not out_path.exists()
+
+def test_export_matches_load_user_records(tmp_path):
+    out_path = tmp_path / "features.npy"
+    stats = convert_export("4PI-ML/4PI.csv", str(out_path), chunk_size=4)
+    assert stats["rows"] == len(load_user_records())
+    np.testing.assert_array_equal(np.load(out_path), records_to_features(load_user_records()))
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from incremental import iter_dataset_chunks
+from main import load_dataset
+from model_store import dataset_parts, dataset_sha256
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "dataset"))
+from gen_data import write_parts
+
+def test_smaller_regeneration_ignores_earlier_parts(tmp_path):
+    write_parts(300, seed=1, out_dir=str(tmp_path), chunk_size=100)
+    write_parts(150, seed=2, out_dir=str(tmp_path), chunk_size=100)
+
+    assert len(dataset_parts(str(tmp_path))) == 2
+    X, y = load_dataset(str(tmp_path))
+    assert X.shape == (150, 16) and y.shape == (150, 4)
+    assert sum(len(X_chunk) for X_chunk, _ in iter_dataset_chunks(str(tmp_path), chunk_size=64)) == 150
+
+def test_hash_ignores_stray_parts_and_needs_the_manifest(tmp_path):
+    write_parts(150, seed=2, out_dir=str(tmp_path), chunk_size=100)
+    digest = dataset_sha256(str(tmp_path))
+    np.save(tmp_path / "part-00007-X.npy", np.zeros((1, 16), dtype=np.uint8))
+    assert dataset_sha256(str(tmp_path)) == digest
+
+    os.remove(tmp_path / "manifest.json")
+    with pytest.raises(ValueError, match="manifest"):
+        load_dataset(str(tmp_path))
@@ -0,0 +1,179 @@
+import csv
+import io
+import random
+
+import numpy as np
+import pytest
+
+import ingest
+from ingest import Ingestor, ScoredStore
+from prediction_cache import PredictionCache
+
+EXPORT_PATH = "4PI-ML/4PI.csv"
+
+def row_scores(X):
+    return np.column_stack([X @ np.arange(1, 17) + d for d in range(4)]).astype(float)
+
+@pytest.fixture
+def cached_scores(monkeypatch):
+    """Score through a shared PredictionCache, like predict_features, without a trained model."""
+    cache = PredictionCache(max_entries=4)
+    monkeypatch.setattr(ingest, "predict_features", lambda X: cache.predict(X, row_scores))
+
+def write_export(path, start, count, header=True, seed=0):
+    with open(EXPORT_PATH, newline="", encoding="utf-8") as f:
+        source = list(csv.reader(f))
+    rng = random.Random(seed)
+    buf = io.StringIO()
+    writer = csv.writer(buf, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    if header:
+        writer.writerow(source[0])
+    for i in range(start, start + count):
+        name = f"user {i}" if i % 7 else f"multi\nline {i}"
+        writer.writerow([name] + [rng.choice(source[1:])[c] for c in range(1, len(source[0]))])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+
+def expected_names(start, stop):
+    return [f"user {i}" if i % 7 else f"multi\nline {i}" for i in range(start, stop)]
+
+def ingest_once(drop_dir, store_path, **kwargs):
+    ingestor = Ingestor(str(drop_dir), str(store_path), executor="thread", workers=4, max_pending=2,
+                        settle_seconds=0, read_bytes=4096, **kwargs)
+    try:
+        return ingestor.scan()
+    finally:
+        ingestor.close()
+
+def assert_scores_match_answers(store):
+    from answer_store import packed_to_features
+    np.testing.assert_array_equal(store.scores(), row_scores(packed_to_features(store.packed())))
+
+def test_thread_workers_store_each_rows_own_scores(tmp_path, cached_scores):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    write_export(drop_dir / "a.csv", 0, 300)
+    assert ingest_once(drop_dir, tmp_path / "store") == 300
+
+    store = ScoredStore(str(tmp_path / "store"))
+    assert store.names() == expected_names(0, 300)
+    assert_scores_match_answers(store)
+
+def test_restart_after_crash_ingests_every_row_once(tmp_path, cached_scores, monkeypatch):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    write_export(drop_dir / "a.csv", 0, 200)
+
+    commits = []
+    append_scored = ScoredStore.append_scored
+
+    def crash_after_two(self, *args):
+        if len(commits) == 2:
+            raise KeyboardInterrupt  # killed between batches
+        commits.append(append_scored(self, *args))
+
+    monkeypatch.setattr(ScoredStore, "append_scored", crash_after_two)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_once(drop_dir, tmp_path / "store")
+    monkeypatch.setattr(ScoredStore, "append_scored", append_scored)
+    assert 0 < commits[-1] < 200
+
+    write_export(drop_dir / "a.csv", 200, 50, header=False, seed=1)
+    ingest_once(drop_dir, tmp_path / "store")
+    assert ingest_once(drop_dir, tmp_path / "store") == 0
+
+    store = ScoredStore(str(tmp_path / "store"))
+    assert store.names() == expected_names(0, 250)
+    assert_scores_match_answers(store)
+
+def test_trailing_row_waits_for_the_file_to_settle(tmp_path, cached_scores):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    write_export(drop_dir / "a.csv", 1, 3)
+    with open(drop_dir / "a.csv", "rb+") as f:
+        f.truncate(f.seek(0, 2) - 1)  # no trailing newline, like 4PI.csv
+
+    ingestor = Ingestor(str(drop_dir), str(tmp_path / "store"), executor="thread", settle_seconds=3600)
+    try:
+        assert ingestor.scan() == 2
+    finally:
+        ingestor.close()
+    assert ingest_once(drop_dir, tmp_path / "store") == 1
+    assert ScoredStore(str(tmp_path / "store")).names() == expected_names(1, 4)
+
+def test_failed_batch_is_not_committed_past(tmp_path, cached_scores, monkeypatch):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    write_export(drop_dir / "a.csv", 1, 300)
+
+    score_batch = ingest.score_batch
+    failures = []
+
+    def fail_once(job):
+        if not failures and b"user 150" in job[0]:
+            failures.append(job)
+            raise RuntimeError("worker died")
+        return score_batch(job)
+
+    monkeypatch.setattr(ingest, "score_batch", fail_once)
+    committed = ingest_once(drop_dir, tmp_path / "store")
+    store = ScoredStore(str(tmp_path / "store"))
+    assert failures and 0 < committed < 300
+    assert store.names() == expected_names(1, 1 + committed)
+    assert "user 150" not in store.names()
+
+    assert ingest_once(drop_dir, tmp_path / "store") == 300 - committed
+    store = ScoredStore(str(tmp_path / "store"))
+    assert store.names() == expected_names(1, 301)
+    assert_scores_match_answers(store)
+
+def test_undecodable_bytes_do_not_fail_the_batch(tmp_path, cached_scores):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    write_export(drop_dir / "a.csv", 1, 5)
+    data = (drop_dir / "a.csv").read_bytes()
+    (drop_dir / "a.csv").write_bytes(data.replace(b'"user 3",', b'"user 3",\xff', 1))
+
+    ingestor = Ingestor(str(drop_dir), str(tmp_path / "store"), executor="thread", settle_seconds=0)
+    try:
+        assert ingestor.scan() == 5
+    finally:
+        ingestor.close()
+    assert ingestor.undecodable == 1
+    assert sum(ingestor.unmatched.values()) == 1
+    assert ScoredStore(str(tmp_path / "store")).names() == expected_names(1, 6)
+
+def replace_export(drop_dir, start, count, seed=0):
+    """Rewrite a.csv through a new file and rename, like an export tool regenerating it."""
+    write_export(drop_dir / "new.tmp", start, count, seed=seed)
+    (drop_dir / "new.tmp").replace(drop_dir / "a.csv")
+
+def test_replaced_export_with_appended_rows_is_not_duplicated(tmp_path, cached_scores):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    replace_export(drop_dir, 1, 100)
+    assert ingest_once(drop_dir, tmp_path / "store") == 100
+
+    write_export(drop_dir / "new.tmp", 1, 100)
+    write_export(drop_dir / "new.tmp", 101, 50, header=False, seed=1)
+    (drop_dir / "new.tmp").replace(drop_dir / "a.csv")
+    assert ingest_once(drop_dir, tmp_path / "store") == 50
+
+    store = ScoredStore(str(tmp_path / "store"))
+    assert store.names() == expected_names(1, 151)
+    assert store.checkpoint()["a.csv"]["reingested"] == 0
+
+def test_export_replaced_by_other_rows_is_ingested_again(tmp_path, cached_scores):
+    drop_dir = tmp_path / "drop"
+    drop_dir.mkdir()
+    replace_export(drop_dir, 1, 100)
+    assert ingest_once(drop_dir, tmp_path / "store") == 100
+
+    replace_export(drop_dir, 201, 30, seed=2)  # shorter and different: truncated and replaced
+    assert ingest_once(drop_dir, tmp_path / "store") == 30
+    assert ingest_once(drop_dir, tmp_path / "store") == 0
+
+    store = ScoredStore(str(tmp_path / "store"))
+    assert store.names() == expected_names(1, 101) + expected_names(201, 231)
+    assert store.checkpoint()["a.csv"]["reingested"] == 1
+    assert_scores_match_answers(store)
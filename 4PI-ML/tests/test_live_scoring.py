@@ -0,0 +1,31 @@
+import numpy as np
+
+from live_scoring import LiveSession
+from main import answers_to_features
+from numpy_model import NumpyLogistic
+
+class ConstantModel:
+    """Non-linear stand-in: no coef, fixed probabilities per output."""
+    def predict_proba(self, X):
+        return [np.column_stack([np.full(len(X), 1 - p), np.full(len(X), p)]) for p in (0.1, 0.2, 0.3, 0.4)]
+
+def test_non_linear_model_argument_is_used():
+    session = LiveSession("ml", model=ConstantModel())
+    session.set_answer(0, 1, 2)
+    assert session.linear is None
+    np.testing.assert_allclose(session.scores(), [0.1, 0.2, 0.3, 0.4])
+
+def test_linear_updates_match_a_full_recompute():
+    rng = np.random.default_rng(0)
+    model = NumpyLogistic({"coef": rng.normal(size=(16, 4)), "intercept": rng.normal(size=4)})
+    session = LiveSession("ml", model=model)
+    for _ in range(500):
+        position = int(rng.integers(15))
+        if rng.random() < 0.1 and position in session.answers:
+            session.remove_answer(position)
+        else:
+            session.set_answer(position, int(rng.integers(4)), int(rng.integers(4)))
+        features = answers_to_features(session.answers.values())
+        np.testing.assert_array_equal(session.features, features[0])
+        expected = np.column_stack([p[:, 1] for p in model.predict_proba(features)])[0]
+        np.testing.assert_allclose(session.scores(), expected, rtol=0, atol=1e-12)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from numpy_model import export_model, model_from_arrays
+
+def test_default_logistic_matches_sklearn_bit_for_bit():
+    sklearn = pytest.importorskip("sklearn")
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.multioutput import MultiOutputClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 5, (400, 16)).astype(float)
+    y = (X[:, :4] + rng.normal(size=(400, 4)) > 2).astype(int)
+    model = MultiOutputClassifier(LogisticRegression(max_iter=500)).fit(X, y)
+
+    X_test = rng.integers(0, 8, (5000, 16)).astype(float)
+    expected = model.predict_proba(X_test)
+    actual = model_from_arrays(export_model(model)).predict_proba(X_test)
+    for e, a in zip(expected, actual):
+        np.testing.assert_array_equal(a, e)
+
+    fast = model_from_arrays(export_model(model), exact=False).predict_proba(X_test)
+    for e, a in zip(expected, fast):
+        np.testing.assert_allclose(a, e, rtol=0, atol=1e-15)
@@ -0,0 +1,64 @@
+import random
+import threading
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+def row_scores(X):
+    """Distinct, reproducible scores per feature row."""
+    return np.column_stack([X @ np.arange(1, 17) + d for d in range(4)]).astype(float)
+
+def row(value):
+    X = np.zeros((1, 16))
+    X[0, value % 16] = 1 + value // 16
+    return X
+
+def test_concurrent_misses_on_the_same_row():
+    cache = PredictionCache(max_entries=8)
+    barrier = threading.Barrier(2)
+
+    def slow_scores(X):
+        barrier.wait(timeout=5)  # both threads have missed before either inserts
+        return row_scores(X)
+
+    threads = [threading.Thread(target=cache.predict, args=(row(1), slow_scores)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    cache.predict(row(2), row_scores)
+    assert len(cache) == 2
+    np.testing.assert_array_equal(cache.predict(row(1), row_scores), row_scores(row(1)))
+    np.testing.assert_array_equal(cache.predict(row(2), row_scores), row_scores(row(2)))
+
+def test_threads_always_get_their_own_rows():
+    cache = PredictionCache(max_entries=16)
+    failures = []
+
+    def run(seed):
+        rng = random.Random(seed)
+        for _ in range(200):
+            X = np.vstack([row(rng.randrange(40)) for _ in range(rng.randint(1, 8))])
+            if not np.array_equal(cache.predict(X, row_scores), row_scores(X)):
+                failures.append(seed)
+
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not failures
+    assert len(cache) <= 16
+
+def test_rebind_drops_rows_scored_by_the_old_model():
+    cache = PredictionCache()
+    cache.bind("old")
+
+    def rebinding_scores(X):
+        cache.bind("new")
+        return row_scores(X)
+
+    cache.predict(row(3), rebinding_scores)
+    assert len(cache) == 0
@@ -0,0 +1,92 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from serve import MicroBatcher, ScoringHandler, ScoringServer
+
+def sum_scores(answers):
+    """(N, Q, 2) -> (N, 4) rows that identify the request they came from."""
+    return np.repeat(answers.sum(axis=(1, 2))[:, None], 4, axis=1).astype(float)
+
+def submit_all(batcher, requests):
+    results = [None] * len(requests)
+
+    def run(i):
+        try:
+            results[i] = batcher.submit(requests[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_mixed_form_lengths_share_a_window():
+    batcher = MicroBatcher(sum_scores, window_ms=200)
+    requests = [np.full((15, 2), 1), np.full((3, 2), 1), np.full((15, 2), 2), np.full((3, 2), 3)]
+    results = submit_all(batcher, requests)
+    for answers, scores in zip(requests, results):
+        assert not isinstance(scores, Exception)
+        assert scores[0] == answers.sum()
+    assert batcher.stats.batches == 1
+
+def test_failing_group_does_not_fail_other_groups():
+    def fail_short(answers):
+        if answers.shape[1] < 15:
+            raise RuntimeError("boom")
+        return sum_scores(answers)
+
+    batcher = MicroBatcher(fail_short, window_ms=200)
+    long_scores, short_error = submit_all(batcher, [np.ones((15, 2), dtype=int), np.ones((3, 2), dtype=int)])
+    assert long_scores[0] == 30
+    assert isinstance(short_error, RuntimeError)
+
+@pytest.fixture
+def server():
+    ScoringHandler.batcher = MicroBatcher(sum_scores, window_ms=1)
+    httpd = ScoringServer(("127.0.0.1", 0), ScoringHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+def post(port, payload):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("POST", "/score", json.dumps(payload), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+@pytest.mark.parametrize("payload", [{"answers": []}, {"answers": [[]]}, {"answers": [[0, 9]]}, {}, []])
+def test_bad_payloads_get_400(server, payload):
+    status, body = post(server, payload)
+    assert status == 400
+    assert "error" in body
+
+def test_scoring_failure_gets_500(server):
+    def fail(answers):
+        raise RuntimeError("model unavailable")
+
+    ScoringHandler.batcher = MicroBatcher(fail, window_ms=1)
+    status, body = post(server, {"answers": [[0, 0]] * 15})
+    assert status == 500
+    assert "model unavailable" in body["error"]
+
+def test_valid_payload(server):
+    status, body = post(server, {"answers": [[1, 2]] * 15})
+    assert status == 200
+    assert list(body["scores"].values()) == [45.0] * 4
+
+@pytest.mark.parametrize("total, concurrency", [(10, 4), (3, 8), (16, 4)])
+def test_loadgen_sends_every_request(server, total, concurrency):
+    from loadgen import run_load
+
+    result = run_load(port=server, total_requests=total, concurrency=concurrency)
+    assert result["requests"] == total
+    assert result["failures"] == 0
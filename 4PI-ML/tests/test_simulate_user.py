@@ -0,0 +1,35 @@
+import copy
+import json
+
+import pytest
+
+import simulate_user
+from simulate_user import QuestionBankIndex, csv_row_to_ml_record, load_user_records, QUESTION_BANK_PATH
+
+def load_bank():
+    with open(QUESTION_BANK_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def test_records_follow_question_bank_changes(monkeypatch):
+    bank = load_bank()
+    edited = copy.deepcopy(bank)
+    for question in edited:
+        question["interest_phase"] = "Passion-Driven Mastery"
+
+    index = QuestionBankIndex(bank)
+    monkeypatch.setattr(simulate_user, "load_question_index", lambda: index)
+    before = load_user_records()
+
+    index = QuestionBankIndex(edited)
+    after = load_user_records()
+    assert after is not before
+    assert all(phase_idx == 3 for record in after for _, phase_idx in record[1:])
+
+def test_empty_index_is_not_replaced_by_the_default():
+    assert csv_row_to_ml_record({"Name": " Ada "}, QuestionBankIndex([])) == ["Ada"]
+
+def test_unsupported_domains_are_named():
+    bank = load_bank()
+    bank[0]["options"][0]["domains"] = {"Arts, Humanities & Creative Studies": 1}
+    with pytest.raises(ValueError, match="cannot score: Arts, Humanities & Creative Studies"):
+        QuestionBankIndex(bank)
@@ -0,0 +1,105 @@
+import numpy as np
+
+from registry import PHASE_ORDER
+
+# Per-domain option count below which Passion-Driven Mastery is not reachable
+PM_THRESHOLD = 3
+DOMAIN_BIAS_STD = 2.0
+
+
+class BankTensor:
+    """
+    A question bank compiled once into dense arrays:
+
+      scores[q, o, d]  score option o of question q gives domain d
+      counts[q, o, d]  how many of the option's domain entries score > 0
+      phase_idx[q]     index of the question's phase in PHASE_ORDER
+      text_id[q]       id shared by questions with identical text
+
+    Every metric takes `forms`, an (F, L) array of question indices, and
+    reduces over it, so a single form, the whole bank (see all_questions)
+    or thousands of pulled forms are analysed the same way.
+    """
+
+    def __init__(self, questions, domain_map=None, domains=None, exclude=()):
+        """
+        domain_map folds bank domain names onto another taxonomy, domains
+        fixes the domain axis (entries outside it are dropped) and exclude
+        lists domain names to ignore entirely.
+        """
+        domain_map = domain_map or {}
+        if domains is None:
+            domains = sorted({
+                domain_map.get(d, d)
+                for q in questions for opt in q["options"] for d in opt["domains"] if d not in exclude
+            })
+        self.domains = list(domains)
+        domain_pos = {d: i for i, d in enumerate(self.domains)}
+
+        num_options = max((len(q["options"]) for q in questions), default=0)
+        shape = (len(questions), num_options, len(self.domains))
+        self.scores = np.zeros(shape, dtype=np.int64)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        for qi, q in enumerate(questions):
+            for oi, opt in enumerate(q["options"]):
+                for d, s in opt["domains"].items():
+                    di = domain_pos.get(domain_map.get(d, d))
+                    if d in exclude or di is None:
+                        continue
+                    self.scores[qi, oi, di] += s
+                    self.counts[qi, oi, di] += s > 0
+
+        self.phase_idx = np.array([PHASE_ORDER.index(q["interest_phase"]) for q in questions], dtype=np.intp)
+        texts = {}
+        self.text_id = np.array([texts.setdefault(q["question"], len(texts)) for q in questions], dtype=np.intp)
+
+        # per-question reductions the metrics gather from
+        self.option_counts = self.counts.sum(axis=1)  # (Q, D) options pointing at each domain
+        self.score_totals = self.scores.sum(axis=1)          # (Q, D)
+
+    @property
+    def all_questions(self):
+        """The whole bank as a single form."""
+        return np.arange(len(self.phase_idx))[None, :]
+
+    def phase_distribution(self, forms):
+        """(F, P) questions per phase."""
+        forms = np.atleast_2d(forms)
+        return (self.phase_idx[forms][..., None] == np.arange(len(PHASE_ORDER))).sum(axis=1)
+
+    def domain_distribution(self, forms, kind="count"):
+        """(F, D) options per domain (kind="count") or summed option scores (kind="score")."""
+        per_question = self.option_counts if kind == "count" else self.score_totals
+        return per_question[np.atleast_2d(forms)].sum(axis=1)
+
+    def phase_domain_matrix(self, forms, kind="count"):
+        """(F, P, D) domain_distribution split by phase."""
+        forms = np.atleast_2d(forms)
+        per_question = (self.option_counts if kind == "count" else self.score_totals)[forms]
+        phase_onehot = self.phase_idx[forms][..., None] == np.arange(len(PHASE_ORDER))
+        return np.einsum("flp,fld->fpd", phase_onehot.astype(np.int64), per_question)
+
+    def domain_bias(self, forms, threshold=DOMAIN_BIAS_STD):
+        """(F,) std of per-domain option counts, and whether it exceeds `threshold`."""
+        std = self.domain_distribution(forms).std(axis=1)
+        return std, std > threshold
+
+    def pm_reachable(self, forms):
+        """(F, D) whether enough options point at a domain to reach Passion-Driven Mastery."""
+        return np.maximum(1, self.domain_distribution(forms) // 4) >= PM_THRESHOLD
+
+    def redundancy(self, forms):
+        """
+        (F,) whether any phase of a form asks the same question text twice,
+        i.e. has fewer unique questions than questions.
+        """
+        forms = np.atleast_2d(forms)
+        keys = np.sort(self.phase_idx[forms] * len(self.text_id) + self.text_id[forms], axis=1)
+        return (np.diff(keys, axis=1) == 0).any(axis=1)
+
+    def phase_flags(self, forms):
+        """(F,) curiosity-heavy and mastery-heavy flags and the dominant phase index."""
+        dist = self.phase_distribution(forms)
+        curiosity_heavy = dist[:, 0] > dist[:, 2] + dist[:, 3]
+        mastery_heavy = dist[:, 3] > dist[:, 0]
+        return curiosity_heavy, mastery_heavy, dist.argmax(axis=1)
@@ -0,0 +1,188 @@
+import atexit
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Opt-in timers and counters shared by the puller, the question tools and
+# 4PI-ML. With FOURPI_INSTRUMENT unset, timer() returns a shared no-op
+# context manager and timed() returns the function untouched, so the
+# instrumented code paths cost nothing.
+ENV_VAR = "FOURPI_INSTRUMENT"
+EXPORT_ENV_VAR = "FOURPI_METRICS_OUT"  # *.prom -> Prometheus text, else JSON lines; unset -> summary on stderr
+METRIC_PREFIX = "fourpi"
+
+ENABLED = os.environ.get(ENV_VAR, "") not in ("", "0")
+
+_timers = {}    # name -> [count, total_seconds, max_seconds]
+_counters = {}  # name -> value
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+# =========================
+# RECORDING
+# =========================
+def record_time(name, seconds):
+    stats = _timers.get(name)
+    if stats is None:
+        _timers[name] = [1, seconds, seconds]
+    else:
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+def timer(name):
+    """Context manager timing its block under `name` (a no-op when disabled)."""
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+def timed(name=None):
+    """Decorator timing every call of the function; returns it unchanged when disabled."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        metric = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_time(metric, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def count(name, n=1):
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + n
+
+def snapshot():
+    return {
+        "timers": {
+            name: {"count": c, "total_s": total, "max_s": peak, "mean_s": total / c}
+            for name, (c, total, peak) in sorted(_timers.items())
+        },
+        "counters": dict(sorted(_counters.items()))
+    }
+
+def reset():
+    _timers.clear()
+    _counters.clear()
+
+# =========================
+# EXPORT
+# =========================
+def _metric_name(name):
+    return "".join(ch if ch.isalnum() else "_" for ch in name).strip("_").lower()
+
+def to_prometheus():
+    """Current metrics in the Prometheus text exposition format."""
+    lines = []
+    snap = snapshot()
+    for name, stats in snap["timers"].items():
+        metric = f"{METRIC_PREFIX}_{_metric_name(name)}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        lines.append(f"{metric}_count {stats['count']}")
+        lines.append(f"{metric}_sum {stats['total_s']:.9f}")
+        lines.append(f"# TYPE {metric}_max gauge")
+        lines.append(f"{metric}_max {stats['max_s']:.9f}")
+    for name, value in snap["counters"].items():
+        metric = f"{METRIC_PREFIX}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def append_jsonl(path):
+    """Append one JSON line per metric, tagged with the time and process id."""
+    import json
+
+    stamp = {"time": time.time(), "pid": os.getpid()}
+    snap = snapshot()
+    with open(path, "a", encoding="utf-8") as f:
+        for name, stats in snap["timers"].items():
+            f.write(json.dumps(dict(stamp, type="timer", name=name, **stats)) + "\n")
+        for name, value in snap["counters"].items():
+            f.write(json.dumps(dict(stamp, type="counter", name=name, value=value)) + "\n")
+
+def export(path):
+    if path.endswith(".prom"):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(to_prometheus())
+        os.replace(tmp_path, path)
+    else:
+        append_jsonl(path)
+
+def print_summary(file=None):
+    import sys
+
+    file = file or sys.stderr
+    snap = snapshot()
+    for name, stats in snap["timers"].items():
+        print(f"[timer] {name}: {stats['count']} calls, {stats['total_s'] * 1000:.2f}ms total, "
+              f"{stats['max_s'] * 1000:.2f}ms max", file=file)
+    for name, value in snap["counters"].items():
+        print(f"[count] {name}: {value}", file=file)
+
+def _export_at_exit():
+    if not (_timers or _counters):
+        return
+    if os.environ.get(EXPORT_ENV_VAR):
+        export(os.environ[EXPORT_ENV_VAR])
+    else:
+        print_summary()
+
+if ENABLED:
+    atexit.register(_export_at_exit)
+
+# =========================
+# PROFILING
+# =========================
+def add_profile_arguments(parser, default_path):
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and dump pstats")
+    parser.add_argument("--profile-out", default=default_path, metavar="PATH", help="pstats file written by --profile")
+
+def profile_path(args):
+    return args.profile_out if args.profile else None
+
+@contextmanager
+def profiling(path):
+    """cProfile the block and dump pstats to `path`; does nothing when `path` is None."""
+    if path is None:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
@@ -1,48 +1,50 @@
-import os
+import argparse
 import json
-from collections import Counter, defaultdict
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+from registry import get_bank, bank_path, PHASE_ORDER
+from analytics import BankTensor
+from raw_to_json import sha256_file, load_manifest
+import instrumentation
 
 BASE_FOLDER = "questions"
 SUMMARY_BASE = os.path.join(BASE_FOLDER, "summary")
-os.makedirs(SUMMARY_BASE, exist_ok=True)
+PREVIEW_BASE = os.path.join(SUMMARY_BASE, "preview")
+CHART_MANIFEST = "chart_manifest.json"
 
 AGE_GROUPS = ["primary", "secondary", "highered", "lifelong"]
+DEFAULT_WORKERS = min(len(AGE_GROUPS), os.cpu_count() or 1)
+
+CHART_NAMES = ["questions_per_phase", "domain_distribution", "phase_vs_domain_heatmap"]
+CHART_FORMATS = ["png", "svg", "pdf"]
+DEFAULT_DPI = 300
+PREVIEW_DPI = 60
 
 def truncate(text, max_len=12):
     return text if len(text) <= max_len else text[:max_len - 1] + "…"
 
-summary_rows = []
-
-for age_group in AGE_GROUPS:
-    json_path = os.path.join(BASE_FOLDER, age_group, f"{age_group}.json")
-    if not os.path.exists(json_path):
-        print(f"❌ Missing: {json_path}")
-        continue
-
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    questions = data  
+# =========================
+# ANALYSIS
+# =========================
+@instrumentation.timed("question_analisys.analyze_group")
+def analyze_group(age_group):
+    """Phase/domain score totals and warnings for one bank, printed to the console."""
+    questions = get_bank(age_group).questions
 
     print(f"\n=== Analysis for {age_group.upper()} ===")
 
-    phase_counter = Counter()
-    domain_counter = Counter()
-    phase_domain = defaultdict(Counter)
+    tensor = BankTensor(questions, exclude=("Neutral",))
+    form = tensor.all_questions
+    phase_totals = tensor.phase_distribution(form)[0]
+    domain_totals = tensor.domain_distribution(form, kind="score")[0]
+    matrix = tensor.phase_domain_matrix(form, kind="score")[0]
 
-    for q in questions:
-        phase = q["interest_phase"]
-        phase_counter[phase] += 1
-
-        for opt in q["options"]:
-            for domain, score in opt["domains"].items():
-                if domain == "Neutral":
-                    continue
-                domain_counter[domain] += score
-                phase_domain[phase][domain] += score
+    present = phase_totals > 0
+    phases = [p for p, keep in zip(PHASE_ORDER, present) if keep]
+    domains = tensor.domains
+    phase_counter = dict(zip(phases, phase_totals[present].tolist()))
+    domain_counter = dict(zip(domains, domain_totals.tolist()))
+    heatmap = matrix[present].tolist()
 
     # ---- Console Output ----
     print("\nPhase distribution:")
@@ -54,9 +56,9 @@ for age_group in AGE_GROUPS:
         print(f"  {d}: {c}")
 
     print("\nDomains per phase:")
-    for p, dmap in phase_domain.items():
+    for p, row in zip(phases, heatmap):
         print(f"  {p}:")
-        for d, c in dmap.items():
+        for d, c in zip(domains, row):
             print(f"    - {d}: {c}")
 
     # ---- Warnings ----
@@ -66,62 +68,182 @@ for age_group in AGE_GROUPS:
         if max(vals) > 2 * min(vals):
             warnings.append("Domain imbalance detected")
 
-    # ---- Prepare folders ----
-    summary_folder = os.path.join(SUMMARY_BASE, age_group)
-    os.makedirs(summary_folder, exist_ok=True)
+    return {
+        "age_group": age_group,
+        "phases": phases,
+        "domains": domains,
+        "phase_counter": phase_counter,
+        "domain_counter": domain_counter,
+        "heatmap": heatmap,
+        "warnings": warnings
+    }
+
+def summary_rows(stats):
+    rows = []
+    for p, row in zip(stats["phases"], stats["heatmap"]):
+        for d, score in zip(stats["domains"], row):
+            rows.append({
+                "Age Group": stats["age_group"],
+                "Phase": p,
+                "Domain": d,
+                "Score": score,
+                "Warnings": "; ".join(stats["warnings"])
+            })
+    return rows
+
+# =========================
+# CHARTS
+# =========================
+def chart_paths(folder, fmt):
+    return [os.path.join(folder, f"{name}.{fmt}") for name in CHART_NAMES]
+
+def import_plotting():
+    # imported once in the parent so forked workers inherit the loaded modules
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+def render_charts(job):
+    """Render the three charts for one age group (runs in a worker process)."""
+    stats, folder, dpi, fmt = job
+    plt, sns = import_plotting()
+
+    age_group = stats["age_group"]
+    os.makedirs(folder, exist_ok=True)
+    phase_path, domain_path, heatmap_path = chart_paths(folder, fmt)
 
     # ---- Phase chart ----
     plt.figure(figsize=(8, 4))
-    plt.bar(phase_counter.keys(), phase_counter.values())
+    plt.bar(stats["phase_counter"].keys(), stats["phase_counter"].values())
     plt.title(f"{age_group} – Questions per Phase")
     plt.xticks(rotation=20)
     plt.tight_layout()
-    plt.savefig(os.path.join(summary_folder, "questions_per_phase.png"), dpi=300)
+    plt.savefig(phase_path, dpi=dpi)
     plt.close()
 
     # ---- Domain chart ----
     plt.figure(figsize=(8, 4))
-    plt.bar(domain_counter.keys(), domain_counter.values())
+    plt.bar(stats["domain_counter"].keys(), stats["domain_counter"].values())
     plt.title(f"{age_group} – Domain Distribution")
     plt.xticks(rotation=30)
     plt.tight_layout()
-    plt.savefig(os.path.join(summary_folder, "domain_distribution.png"), dpi=300)
+    plt.savefig(domain_path, dpi=dpi)
     plt.close()
 
     # ---- Heatmap ----
-    phases = list(phase_domain.keys())
-    domains = sorted(domain_counter.keys())
-
-    heatmap = [[phase_domain[p].get(d, 0) for d in domains] for p in phases]
-
     plt.figure(figsize=(10, 6))
     sns.heatmap(
-        heatmap,
+        stats["heatmap"],
         annot=True,
         fmt="d",
-        xticklabels=[truncate(d) for d in domains],
-        yticklabels=phases,
+        xticklabels=[truncate(d) for d in stats["domains"]],
+        yticklabels=stats["phases"],
         cmap="YlGnBu"
     )
     plt.title(f"{age_group} – Phase × Domain")
     plt.tight_layout()
-    plt.savefig(os.path.join(summary_folder, "phase_vs_domain_heatmap.png"), dpi=300)
+    plt.savefig(heatmap_path, dpi=dpi)
     plt.close()
 
-    # ---- CSV rows ----
-    for p in phases:
-        for d in domains:
-            summary_rows.append({
-                "Age Group": age_group,
-                "Phase": p,
-                "Domain": d,
-                "Score": phase_domain[p].get(d, 0),
-                "Warnings": "; ".join(warnings)
-            })
+    return age_group
 
-# ---- Save CSV ----
-df = pd.DataFrame(summary_rows)
-csv_path = os.path.join(SUMMARY_BASE, "question_analysis_summary.csv")
-df.to_csv(csv_path, index=False)
+def is_up_to_date(entry, bank_hash, dpi, fmt, folder):
+    return (
+        entry is not None
+        and entry.get("bank_sha256") == bank_hash
+        and entry.get("dpi") == dpi
+        and entry.get("format") == fmt
+        and all(os.path.exists(p) for p in chart_paths(folder, fmt))
+    )
 
-print(f"\nSummary saved to {csv_path}")
+def write_json_atomic(data, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def write_csv_atomic(rows, path):
+    import pandas as pd
+
+    tmp_path = path + ".tmp"
+    pd.DataFrame(rows).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+# =========================
+# BUILD
+# =========================
+def main(force=False, workers=DEFAULT_WORKERS, dpi=DEFAULT_DPI, fmt="png", preview=False):
+    """
+    Analyse every bank and write question_analysis_summary.csv, re-rendering
+    only the charts whose bank hash, DPI or format changed since the last
+    run. Stale groups render in a process pool. Preview mode writes low-res
+    charts under summary/preview/ and leaves the full-size charts alone.
+    """
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unknown chart format '{fmt}', expected one of {CHART_FORMATS}")
+    if preview:
+        dpi = PREVIEW_DPI
+
+    chart_base = PREVIEW_BASE if preview else SUMMARY_BASE
+    os.makedirs(chart_base, exist_ok=True)
+    manifest_path = os.path.join(chart_base, CHART_MANIFEST)
+    manifest = load_manifest(manifest_path)
+
+    rows = []
+    jobs = {}
+    hashes = {}
+    for age_group in AGE_GROUPS:
+        json_path = bank_path(age_group)
+        if not os.path.exists(json_path):
+            print(f"❌ Missing: {json_path}")
+            continue
+
+        stats = analyze_group(age_group)
+        rows.extend(summary_rows(stats))
+
+        folder = os.path.join(chart_base, age_group)
+        hashes[age_group] = sha256_file(json_path)
+        if not force and is_up_to_date(manifest.get(age_group), hashes[age_group], dpi, fmt, folder):
+            print(f"\nCharts for {age_group} are up to date, skipping")
+            instrumentation.count("question_analisys.groups_skipped")
+            continue
+
+        jobs[age_group] = (stats, folder, dpi, fmt)
+
+    with instrumentation.timer("question_analisys.render"):
+        if jobs:
+            import_plotting()
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                rendered = list(pool.map(render_charts, jobs.values()))
+        else:
+            rendered = [render_charts(job) for job in jobs.values()]
+
+    for age_group in rendered:
+        manifest[age_group] = {"bank_sha256": hashes[age_group], "dpi": dpi, "format": fmt}
+        print(f"Rendered charts for {age_group} -> {jobs[age_group][1]}")
+
+    if rendered:
+        write_json_atomic({g: manifest[g] for g in AGE_GROUPS if g in manifest}, manifest_path)
+
+    # ---- Save CSV ----
+    csv_path = os.path.join(SUMMARY_BASE, "question_analysis_summary.csv")
+    write_csv_atomic(rows, csv_path)
+
+    print(f"\nSummary saved to {csv_path}")
+    return rendered
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise question banks and render their charts")
+    parser.add_argument("--force", action="store_true", help="re-render every chart even if its bank is unchanged")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--format", choices=CHART_FORMATS, default="png")
+    parser.add_argument("--preview", action="store_true", help=f"fast {PREVIEW_DPI}-dpi charts under {PREVIEW_BASE}")
+    instrumentation.add_profile_arguments(parser, "questions/question_analisys.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        main(args.force, args.workers, args.dpi, args.format, args.preview)
@@ -1,6 +1,12 @@
+import argparse
+import hashlib
 import json
 import os
 import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
 
 PHASE_SCORES = {
     "Curiosity Activation": 1,
@@ -18,6 +24,12 @@ FILE_PREFIX = {
 
 AGE_GROUPS = ["primary", "secondary", "highered", "lifelong"]
 
+MANIFEST_FILE = "manifest.json"
+
+BLOCK_SPLIT_RE = re.compile(r"\n\s*\n")
+QUESTION_NUMBER_RE = re.compile(r"^\d+\.\s*")
+OPTION_RE = re.compile(r"[A-D]\.\s*(.*?)\s*\((.*?)\)")
+
 def parse_raw_file(filename):
     level = os.path.basename(filename).replace("raw_", "").replace(".txt", "")
     prefix = FILE_PREFIX[level]
@@ -26,7 +38,7 @@ def parse_raw_file(filename):
     with open(filename, "r", encoding="utf-8") as f:
         content = f.read().strip()
 
-    blocks = re.split(r"\n\s*\n", content)
+    blocks = BLOCK_SPLIT_RE.split(content)
     q_count = 1
 
     for block in blocks:
@@ -34,7 +46,7 @@ def parse_raw_file(filename):
         if len(lines) < 6:
             continue
 
-        question_text = re.sub(r"^\d+\.\s*", "", lines[0])
+        question_text = QUESTION_NUMBER_RE.sub("", lines[0])
         phase = lines[1].replace("Phase:", "").strip()
         phase_score = PHASE_SCORES.get(phase, 0)
 
@@ -42,7 +54,7 @@ def parse_raw_file(filename):
         opt_code = 1
 
         for line in lines[2:]:
-            match = re.match(r"[A-D]\.\s*(.*?)\s*\((.*?)\)", line)
+            match = OPTION_RE.match(line)
             if not match:
                 continue
 
@@ -65,10 +77,57 @@ def parse_raw_file(filename):
 
     return questions
 
-def main():
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def bank_counts(questions):
+    phase_counts = Counter(q["interest_phase"] for q in questions)
+    domain_counts = Counter(
+        domain for q in questions for opt in q["options"] for domain in opt["domains"]
+    )
+    return {
+        "questions": len(questions),
+        "phase_counts": {p: phase_counts.get(p, 0) for p in PHASE_SCORES},
+        "domain_counts": dict(sorted(domain_counts.items())),
+    }
+
+def build_group(job):
+    """Parse one raw file, write its JSON bank and return its manifest entry."""
+    raw_file, json_file, raw_hash = job
+    data = parse_raw_file(raw_file)
+
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    return dict(raw_sha256=raw_hash, json_sha256=sha256_file(json_file), **bank_counts(data))
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_up_to_date(entry, raw_hash, json_file):
+    return (
+        entry is not None
+        and entry.get("raw_sha256") == raw_hash
+        and os.path.exists(json_file)
+        and entry.get("json_sha256") == sha256_file(json_file)
+    )
+
+def main(force=False, workers=len(AGE_GROUPS)):
+    """
+    Rebuild only the banks whose raw file (or generated JSON) changed since
+    the last run, in parallel, and record per-group hashes and counts in
+    questions/manifest.json so downstream caches can tell which groups changed.
+    """
     base_folder = "questions/"
     os.makedirs(base_folder, exist_ok=True)
+    manifest_path = os.path.join(base_folder, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
 
+    jobs = {}
     for age_group in AGE_GROUPS:
         folder_path = os.path.join(base_folder, age_group)
         os.makedirs(folder_path, exist_ok=True)
@@ -78,13 +137,38 @@ def main():
             print(f"Raw file not found: {raw_file}")
             continue
 
-        data = parse_raw_file(raw_file)
         json_file = os.path.join(folder_path, f"{age_group}.json")
+        raw_hash = sha256_file(raw_file)
+        if not force and is_up_to_date(manifest.get(age_group), raw_hash, json_file):
+            print(f"Unchanged {raw_file}, skipping")
+            continue
+
+        jobs[age_group] = (raw_file, json_file, raw_hash)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            entries = dict(zip(jobs, pool.map(build_group, jobs.values())))
+    else:
+        entries = {age_group: build_group(job) for age_group, job in jobs.items()}
+
+    for age_group, entry in entries.items():
+        manifest[age_group] = entry
+        print(f"Processed {jobs[age_group][0]} -> {jobs[age_group][1]}")
 
-        with open(json_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    if entries or not os.path.exists(manifest_path):
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({g: manifest[g] for g in AGE_GROUPS if g in manifest}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
 
-        print(f"Processed {raw_file} -> {json_file}")
+    return sorted(entries)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Compile raw question files into JSON banks")
+    parser.add_argument("--force", action="store_true", help="rebuild every bank even if unchanged")
+    parser.add_argument("--workers", type=int, default=len(AGE_GROUPS))
+    instrumentation.add_profile_arguments(parser, "questions/raw_to_json.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        main(args.force, args.workers)
@@ -0,0 +1,137 @@
+import json
+import os
+import pickle
+
+import instrumentation
+
+# Paths are relative to this file so every tool can import the registry
+# regardless of the working directory it was started from.
+BANK_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BANK_DIR, ".cache")
+
+AGE_GROUPS = ["primary", "secondary", "highered", "lifelong"]
+
+PHASE_ORDER = [
+    "Curiosity Activation",
+    "Engagement Sustainment",
+    "Personal Relevance Formation",
+    "Passion-Driven Mastery"
+]
+
+# Write a pre-parsed pickle next to the banks, keyed by the source mtime and size
+PERSIST_CACHE = True
+CACHE_VERSION = 1
+
+
+class QuestionBank:
+    """
+    A validated question bank with lookups by question_id, phase and domain.
+    Question dicts are shared with every caller and must be treated as read-only.
+    """
+
+    def __init__(self, name, questions):
+        self.name = name
+        self.questions = questions
+        self.by_id = {q["question_id"]: q for q in questions}
+
+        self.by_phase = {phase: [] for phase in PHASE_ORDER}
+        self.by_domain = {}
+        for q in questions:
+            self.by_phase[q["interest_phase"]].append(q)
+            for domain in {d for opt in q["options"] for d in opt["domains"]}:
+                self.by_domain.setdefault(domain, []).append(q)
+
+        self.domains = sorted(self.by_domain)
+
+    def __len__(self):
+        return len(self.questions)
+
+
+def validate_questions(questions, source):
+    if not isinstance(questions, list):
+        raise ValueError(f"{source}: expected a list of questions")
+
+    seen_ids = set()
+    for i, q in enumerate(questions):
+        for key in ("question_id", "interest_phase", "question", "options"):
+            if key not in q:
+                raise ValueError(f"{source}: question {i} is missing '{key}'")
+        if q["question_id"] in seen_ids:
+            raise ValueError(f"{source}: duplicate question_id {q['question_id']}")
+        seen_ids.add(q["question_id"])
+        if q["interest_phase"] not in PHASE_ORDER:
+            raise ValueError(f"{source}: {q['question_id']} has unknown phase '{q['interest_phase']}'")
+        if not q["options"]:
+            raise ValueError(f"{source}: {q['question_id']} has no options")
+        for opt in q["options"]:
+            if "text" not in opt or not isinstance(opt.get("domains"), dict):
+                raise ValueError(f"{source}: {q['question_id']} has a malformed option")
+
+
+def bank_path(age_group):
+    return os.path.join(BANK_DIR, age_group, f"{age_group}.json")
+
+
+_banks = {}
+
+
+def _read_cache(cache_path, stamp):
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+    if cached.get("version") != CACHE_VERSION or cached.get("stamp") != stamp:
+        return None
+    return cached["questions"]
+
+
+def _write_cache(cache_path, stamp, questions):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": CACHE_VERSION, "stamp": stamp, "questions": questions}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def load_bank_file(path, name=None, persist=PERSIST_CACHE):
+    """
+    Load and validate a bank-format JSON file once per process. The result is
+    reused until the file's mtime or size changes; with `persist`, the parsed
+    questions are also kept in questions/.cache across processes.
+    """
+    path = os.path.abspath(path)
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    st = os.stat(path)
+    stamp = (path, st.st_mtime_ns, st.st_size)
+
+    cached = _banks.get(path)
+    if cached is not None and cached[0] == stamp:
+        instrumentation.count("registry.memory_hits")
+        return cached[1]
+
+    cache_path = os.path.join(CACHE_DIR, f"{name}.pkl")
+    with instrumentation.timer("registry.read_cache"):
+        questions = _read_cache(cache_path, stamp) if persist else None
+    if questions is None:
+        with instrumentation.timer("registry.parse_json"):
+            with open(path, "r", encoding="utf-8") as f:
+                questions = json.load(f)
+            validate_questions(questions, path)
+        if persist:
+            _write_cache(cache_path, stamp, questions)
+
+    bank = QuestionBank(name, questions)
+    _banks[path] = (stamp, bank)
+    return bank
+
+
+def get_bank(age_group, persist=PERSIST_CACHE):
+    if age_group not in AGE_GROUPS:
+        raise ValueError(f"Unknown age group: {age_group} (expected one of {AGE_GROUPS})")
+    return load_bank_file(bank_path(age_group), age_group, persist)
+
+
+def load_all(persist=PERSIST_CACHE):
+    return {age_group: get_bank(age_group, persist) for age_group in AGE_GROUPS}
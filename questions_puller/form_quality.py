@@ -0,0 +1,200 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils import DOMAIN_MAP, PHASE_ORDER, PHASE_SEQUENCES
+from main import load_questions, domain_axis, compute_phase_counts
+from sampler import FormSampler
+from analytics import BankTensor
+import instrumentation
+
+FLAGS = ["domain_bias_detected", "redundancy_risk_detected", "curiosity_heavy_dataset", "mastery_heavy_dataset"]
+
+# 95% normal-approximation confidence interval
+Z = 1.96
+DEFAULT_TOLERANCE = 0.005
+MIN_FORMS = 10_000
+TOP_DRIVERS = 10
+
+# =========================
+# SIMULATION
+# =========================
+_engines = {}
+
+def get_engine(age_group, phase_sequence):
+    """Sampler and compiled bank for one config, built once per process."""
+    key = (age_group, tuple(phase_sequence))
+    if key not in _engines:
+        questions = load_questions(age_group)
+        seen = {DOMAIN_MAP.get(d, d) for q in questions for opt in q["options"] for d in opt["domains"]}
+        _engines[key] = (
+            FormSampler(questions, phase_sequence),
+            BankTensor(questions, domain_map=DOMAIN_MAP, domains=domain_axis(seen))
+        )
+    return _engines[key]
+
+def evaluate_forms(tensor, forms):
+    """
+    Flag counts and exposure sums for a batch of forms. Every field is a
+    sum, so results from separate batches combine with merge_totals.
+    """
+    _, biased = tensor.domain_bias(forms)
+    curiosity_heavy, mastery_heavy, _ = tensor.phase_flags(forms)
+    exposure = tensor.domain_distribution(forms)
+    num_questions = len(tensor.phase_idx)
+
+    return {
+        "forms": len(forms),
+        "flags": np.array([
+            biased.sum(), tensor.redundancy(forms).sum(), curiosity_heavy.sum(), mastery_heavy.sum()
+        ], dtype=np.int64),
+        "pm_reachable": tensor.pm_reachable(forms).sum(axis=0),
+        "exposure_sum": exposure.sum(axis=0),
+        "exposure_sumsq": (exposure ** 2).sum(axis=0),
+        "question_forms": np.bincount(forms.ravel(), minlength=num_questions),
+        "question_biased": np.bincount(forms[biased].ravel(), minlength=num_questions)
+    }
+
+def merge_totals(a, b):
+    if a is None:
+        return b
+    return {k: a[k] + b[k] for k in a}
+
+def simulate_chunk(job):
+    age_group, phase_sequence, seed, num_forms = job
+    sampler, tensor = get_engine(age_group, phase_sequence)
+    sampler.rng = np.random.default_rng(seed)
+    return evaluate_forms(tensor, sampler.draw(num_forms))
+
+def ci_half_width(count, n):
+    p = count / n
+    return Z * math.sqrt(p * (1 - p) / n)
+
+def converged(totals, tolerance):
+    return max(ci_half_width(c, totals["forms"]) for c in totals["flags"]) <= tolerance
+
+def evaluate(age_group, max_forms=100_000, chunk_size=10_000, workers=None, tolerance=DEFAULT_TOLERANCE,
+             seed=None, phase_sequence=None, min_forms=MIN_FORMS):
+    """
+    Simulate up to `max_forms` pulls, one round of `workers` chunks at a
+    time, and stop early once every flag rate's 95% CI half-width is within
+    `tolerance` (after at least `min_forms` forms).
+    """
+    if phase_sequence is None:
+        phase_sequence = PHASE_SEQUENCES[age_group]
+    workers = workers or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed)
+
+    totals = None
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while totals is None or totals["forms"] < max_forms:
+            remaining = max_forms - (totals["forms"] if totals else 0)
+            sizes = [min(chunk_size, remaining - i * chunk_size) for i in range(workers)]
+            jobs = [(age_group, phase_sequence, s, n) for s, n in zip(seeds.spawn(workers), sizes) if n > 0]
+            results = pool.map(simulate_chunk, jobs) if pool else map(simulate_chunk, jobs)
+            for result in results:
+                totals = merge_totals(totals, result)
+            if totals["forms"] >= min_forms and converged(totals, tolerance):
+                break
+    finally:
+        if pool:
+            pool.shutdown()
+
+    _, tensor = get_engine(age_group, phase_sequence)
+    return summarize(age_group, totals, tensor, load_questions(age_group))
+
+# =========================
+# REPORT
+# =========================
+def summarize(age_group, totals, tensor, questions):
+    n = totals["forms"]
+    flags = {
+        name: {"rate": count / n, "ci95": ci_half_width(count, n)}
+        for name, count in zip(FLAGS, totals["flags"].tolist())
+    }
+
+    mean = totals["exposure_sum"] / n
+    variance = totals["exposure_sumsq"] / n - mean ** 2
+    exposure = {
+        d: {"mean": float(m), "variance": float(v)}
+        for d, m, v in zip(tensor.domains, mean, variance)
+    }
+
+    # lift = P(bias | question on the form) / P(bias)
+    bias_rate = totals["flags"][0] / n
+    asked = totals["question_forms"]
+    lift = np.zeros(len(asked))
+    if bias_rate:
+        np.divide(totals["question_biased"] / bias_rate, asked, out=lift, where=asked > 0)
+    drivers = [
+        {
+            "question_id": questions[q]["question_id"],
+            "phase": questions[q]["interest_phase"],
+            "lift": float(lift[q]),
+            "top_domain": tensor.domains[int(tensor.option_counts[q].argmax())]
+        }
+        for q in np.argsort(-lift, kind="stable")[:TOP_DRIVERS] if lift[q] > 1
+    ]
+
+    return {
+        "age_group": age_group,
+        "forms": n,
+        "flags": flags,
+        "pm_reachable": {d: c / n for d, c in zip(tensor.domains, totals["pm_reachable"].tolist())},
+        "domain_exposure": exposure,
+        "bias_drivers": drivers
+    }
+
+def print_report(report):
+    print(f"\nAGE GROUP: {report['age_group'].upper()} ({report['forms']} forms)")
+
+    print("Flag rates (95% CI):")
+    for name, f in report["flags"].items():
+        print(f"  {name}: {f['rate']:.4f} ± {f['ci95']:.4f}")
+
+    print("PM reachable / domain exposure (mean, variance):")
+    for d, e in report["domain_exposure"].items():
+        print(f"  {d}: {report['pm_reachable'][d]:.4f} | {e['mean']:.2f}, {e['variance']:.2f}")
+
+    if report["bias_drivers"]:
+        print("Questions driving domain bias (lift):")
+        for q in report["bias_drivers"]:
+            print(f"  {q['question_id']} [{q['phase']}] {q['lift']:.2f} -> {q['top_domain']}")
+
+def sequence_from_weights(age_group):
+    """A phase sequence with compute_phase_counts' per-phase totals, in phase order."""
+    counts = compute_phase_counts(age_group)
+    return [phase for phase in PHASE_ORDER for _ in range(counts[phase])]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo quality report over many pulled forms")
+    parser.add_argument("age_groups", nargs="*", help=f"any of {', '.join(PHASE_SEQUENCES)} (default: all)")
+    parser.add_argument("--forms", type=int, default=100_000, help="upper bound on simulated forms per group")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="stop once every flag CI half-width is below this")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--from-weights", action="store_true", help="use PHASE_WEIGHTS counts instead of PHASE_SEQUENCES")
+    parser.add_argument("--json", default=None, help="also write the reports to this file")
+    instrumentation.add_profile_arguments(parser, "questions_puller/form_quality.prof")
+    args = parser.parse_args()
+    unknown = set(args.age_groups) - set(PHASE_SEQUENCES)
+    if unknown:
+        parser.error(f"unknown age group(s): {', '.join(sorted(unknown))}")
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        reports = []
+        for age_group in args.age_groups or list(PHASE_SEQUENCES):
+            sequence = sequence_from_weights(age_group) if args.from_weights else None
+            report = evaluate(age_group, args.forms, args.chunk_size, args.workers, args.tolerance, args.seed, sequence)
+            print_report(report)
+            reports.append(report)
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(reports, f, indent=2, ensure_ascii=False)
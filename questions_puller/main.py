@@ -1,13 +1,22 @@
+import argparse
+import importlib.util
 import json
+import os
 import random
 import numpy as np
 from collections import Counter, defaultdict
 from utils import *
 
+_spec = importlib.util.spec_from_file_location(
+    "questions_path", os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "4PI-ML", "questions_path.py"))
+_spec.loader.exec_module(importlib.util.module_from_spec(_spec))
+from registry import get_bank
+from analytics import BankTensor, PM_THRESHOLD
+import instrumentation
+
 def load_questions(age_group):
-    filename = f"questions/{age_group}.json"
-    with open(filename, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # banks live at questions/<group>/<group>.json and are parsed once per process
+    return list(get_bank(age_group).questions)
 
 def save_pulled_questions(questions):
     shuffled_questions = []
@@ -41,6 +50,7 @@ def compute_phase_counts(age_group, total_q=15):
 
     return phase_counts
 
+@instrumentation.timed("puller.pull_questions")
 def pull_questions(age_group, total_q=15):
     questions = load_questions(age_group)
     phase_sequence = PHASE_SEQUENCES[age_group]
@@ -65,99 +75,87 @@ def pull_questions(age_group, total_q=15):
 
     return selected
 
-def analyze_questions(selected_questions):
-    phase_dist = Counter(q["interest_phase"] for q in selected_questions)
-    ordered_phase_dist = {p: phase_dist.get(p, 0) for p in PHASE_ORDER}
-
-    domain_dist = Counter()
-    phase_domain_matrix = defaultdict(lambda: Counter())
-
-    for q in selected_questions:
-        phase = q["interest_phase"]
-        for opt in q["options"]:
-            for domain, score in opt["domains"].items():
-                if score > 0:
-                    mapped = DOMAIN_MAP[domain]
-                    domain_dist[mapped] += 1
-                    phase_domain_matrix[phase][mapped] += 1
-
-    domain_dist = {d: domain_dist.get(d, 0) for d in DOMAINS}
+def domain_axis(seen_domains):
+    """
+    DOMAINS for forms in the 4-domain taxonomy, otherwise the bank's own
+    domain names (the current banks use a 6-domain taxonomy).
+    """
+    if set(seen_domains) <= set(DOMAINS):
+        return DOMAINS
+    return sorted(seen_domains)
 
-    domain_std = np.std(list(domain_dist.values()))
-    domain_bias = domain_std > 2.0
-
-    dominant_phase = max(ordered_phase_dist, key=ordered_phase_dist.get)
-
-    thresholds = {}
-    threshold_flags = {}
-
-    for domain in DOMAINS:
-        n = max(1, domain_dist[domain] // 4)
-
-        thresholds[domain] = {
+@instrumentation.timed("puller.analyze_questions")
+def analyze_questions(selected_questions):
+    seen = {
+        DOMAIN_MAP.get(domain, domain)
+        for q in selected_questions for opt in q["options"]
+        for domain, score in opt["domains"].items() if score > 0
+    }
+    tensor = BankTensor(selected_questions, domain_map=DOMAIN_MAP, domains=domain_axis(seen))
+    form = tensor.all_questions
+
+    phase_counts = tensor.phase_distribution(form)[0]
+    domain_counts = tensor.domain_distribution(form)[0]
+    matrix = tensor.phase_domain_matrix(form)[0]
+    _, domain_bias = tensor.domain_bias(form)
+    pm_reachable = tensor.pm_reachable(form)[0]
+    curiosity_heavy, mastery_heavy, dominant = tensor.phase_flags(form)
+
+    thresholds = {
+        domain: {
             "Curiosity Activation": 1,
             "Engagement Sustainment": 1,
             "Personal Relevance Formation": 2,
-            "Passion-Driven Mastery": 3
-        }
-
-        threshold_flags[domain] = {
-            "pm_reachable": n >= thresholds[domain]["Passion-Driven Mastery"]
+            "Passion-Driven Mastery": PM_THRESHOLD
         }
-
-    curiosity_heavy = ordered_phase_dist["Curiosity Activation"] > (
-        ordered_phase_dist["Personal Relevance Formation"] +
-        ordered_phase_dist["Passion-Driven Mastery"]
-    )
-
-    mastery_heavy = ordered_phase_dist["Passion-Driven Mastery"] > ordered_phase_dist["Curiosity Activation"]
-
-    phase_unique_questions = {
-        phase: len({q["question"] for q in selected_questions if q["interest_phase"] == phase})
-        for phase in PHASE_ORDER
+        for domain in tensor.domains
     }
 
-    redundancy_risk = any(
-        phase_unique_questions[p] < ordered_phase_dist[p]
-        for p in PHASE_ORDER
-    )
-
     return {
-        "phase_distribution": ordered_phase_dist,
-        "domain_distribution": domain_dist,
+        "phase_distribution": dict(zip(PHASE_ORDER, phase_counts.tolist())),
+        "domain_distribution": dict(zip(tensor.domains, domain_counts.tolist())),
         "phase_domain_matrix": {
-            p: dict(phase_domain_matrix[p]) for p in PHASE_ORDER
+            p: {d: int(c) for d, c in zip(tensor.domains, row) if c}
+            for p, row in zip(PHASE_ORDER, matrix)
         },
-        "domain_bias_detected": domain_bias,
-        "dominant_phase": dominant_phase,
+        "domain_bias_detected": bool(domain_bias[0]),
+        "dominant_phase": PHASE_ORDER[dominant[0]],
         "domain_phase_thresholds": thresholds,
-        "threshold_reachability": threshold_flags,
-        "curiosity_heavy_dataset": curiosity_heavy,
-        "mastery_heavy_dataset": mastery_heavy,
-        "redundancy_risk_detected": redundancy_risk
+        "threshold_reachability": {
+            d: {"pm_reachable": bool(r)} for d, r in zip(tensor.domains, pm_reachable)
+        },
+        "curiosity_heavy_dataset": bool(curiosity_heavy[0]),
+        "mastery_heavy_dataset": bool(mastery_heavy[0]),
+        "redundancy_risk_detected": bool(tensor.redundancy(form)[0])
     }
 
-age_group = "highered"  # primary / secondary / highered / lifelong
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pull and analyse one question form")
+    instrumentation.add_profile_arguments(parser, "questions_puller/main.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        age_group = "highered"  # primary / secondary / highered / lifelong
 
-selected = pull_questions(age_group)
-save_pulled_questions(selected)
-insights = analyze_questions(selected)
+        selected = pull_questions(age_group)
+        save_pulled_questions(selected)
+        insights = analyze_questions(selected)
 
-print("\nAGE GROUP:", age_group.upper())
-print("Phase Distribution:", insights["phase_distribution"])
-print("Domain Distribution:", insights["domain_distribution"])
-print("Domain Bias Detected:", insights["domain_bias_detected"])
-print("Dominant Phase:", insights["dominant_phase"])
+        print("\nAGE GROUP:", age_group.upper())
+        print("Phase Distribution:", insights["phase_distribution"])
+        print("Domain Distribution:", insights["domain_distribution"])
+        print("Domain Bias Detected:", insights["domain_bias_detected"])
+        print("Dominant Phase:", insights["dominant_phase"])
 
-print("\nPhase x Domain Matrix:")
-for phase, domains in insights["phase_domain_matrix"].items():
-    print(phase, ":", domains)
+        print("\nPhase x Domain Matrix:")
+        for phase, domains in insights["phase_domain_matrix"].items():
+            print(phase, ":", domains)
 
-print("\nDomain - Phase Thresholds (minimum):")
-for domain, t in insights["domain_phase_thresholds"].items():
-    print(domain, ":", t, "| PM Reachable:", insights["threshold_reachability"][domain]["pm_reachable"])
+        print("\nDomain - Phase Thresholds (minimum):")
+        for domain, t in insights["domain_phase_thresholds"].items():
+            print(domain, ":", t, "| PM Reachable:", insights["threshold_reachability"][domain]["pm_reachable"])
 
-print("\nDataset Flags:")
-print("Curiosity Heavy Dataset:", insights["curiosity_heavy_dataset"])
-print("Mastery Heavy Dataset:", insights["mastery_heavy_dataset"])
-print("Redundancy Risk Detected:", insights["redundancy_risk_detected"])
\ No newline at end of file
+        print("\nDataset Flags:")
+        print("Curiosity Heavy Dataset:", insights["curiosity_heavy_dataset"])
+        print("Mastery Heavy Dataset:", insights["mastery_heavy_dataset"])
+        print("Redundancy Risk Detected:", insights["redundancy_risk_detected"])
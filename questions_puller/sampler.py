@@ -0,0 +1,102 @@
+import argparse
+import json
+from collections import Counter
+
+import numpy as np
+
+from utils import PHASE_SEQUENCES, PHASE_ORDER
+from main import load_questions
+import instrumentation
+
+class FormSampler:
+    """
+    Loads an age group's bank once, indexes it by phase and draws many
+    randomized 15-question forms that follow PHASE_SEQUENCES[age_group].
+
+    Forms are drawn in bulk with seeded NumPy permutations, so a given
+    seed always yields the same forms and no question repeats within a form.
+    """
+
+    def __init__(self, questions, phase_sequence, seed=None):
+        self.questions = questions
+        self.phase_sequence = list(phase_sequence)
+        self.rng = np.random.default_rng(seed)
+
+        self.pools = {
+            phase: np.array([i for i, q in enumerate(questions) if q["interest_phase"] == phase], dtype=np.intp)
+            for phase in PHASE_ORDER
+        }
+        # form slots filled from each phase, in sequence order
+        self.slots = {phase: [j for j, p in enumerate(self.phase_sequence) if p == phase] for phase in PHASE_ORDER}
+
+        for phase, needed in Counter(self.phase_sequence).items():
+            if needed > len(self.pools.get(phase, [])):
+                raise ValueError(f"Not enough questions for phase: {phase}")
+
+        self.num_options = np.array([len(q["options"]) for q in questions], dtype=np.intp)
+
+    @classmethod
+    def for_age_group(cls, age_group, seed=None):
+        return cls(load_questions(age_group), PHASE_SEQUENCES[age_group], seed)
+
+    def draw(self, num_forms):
+        """
+        (num_forms, len(phase_sequence)) array of question indices into the bank.
+        """
+        forms = np.empty((num_forms, len(self.phase_sequence)), dtype=np.intp)
+        for phase, slots in self.slots.items():
+            if not slots:
+                continue
+            pool = self.pools[phase]
+            # a permutation of the pool per form; its first len(slots) entries fill the slots
+            picks = self.rng.permuted(np.broadcast_to(pool, (num_forms, pool.size)), axis=1)
+            forms[:, slots] = picks[:, :len(slots)]
+        return forms
+
+    def draw_option_orders(self, forms):
+        """
+        Per-question option permutations for each form, padded with -1 where
+        a question has fewer options than the widest one.
+        """
+        widths = self.num_options[forms]
+        keys = self.rng.random(forms.shape + (int(self.num_options.max()),))
+        keys[np.arange(keys.shape[-1]) >= widths[..., None]] = np.inf
+        orders = np.argsort(keys, axis=-1)
+        orders[np.arange(keys.shape[-1]) >= widths[..., None]] = -1
+        return orders
+
+    def iter_forms(self, num_forms, chunk_size=1000):
+        """
+        Yield forms in the pulled_questions.json layout (question dicts with
+        shuffled options), drawing `chunk_size` forms at a time.
+        """
+        for start in range(0, num_forms, chunk_size):
+            forms = self.draw(min(chunk_size, num_forms - start))
+            orders = self.draw_option_orders(forms)
+            for form, order in zip(forms, orders):
+                yield [
+                    dict(self.questions[q], options=[self.questions[q]["options"][o] for o in opts if o >= 0])
+                    for q, opts in zip(form, order)
+                ]
+
+    def write_jsonl(self, path, num_forms, chunk_size=1000, age_group=None):
+        """Stream `num_forms` forms to `path`, one JSON object per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            for form_id, form in enumerate(self.iter_forms(num_forms, chunk_size)):
+                record = {"form_id": form_id, "age_group": age_group, "questions": form}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return num_forms
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate many randomized question forms")
+    parser.add_argument("age_group", choices=list(PHASE_SEQUENCES))
+    parser.add_argument("--forms", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="questions_puller/pulled_forms.jsonl")
+    instrumentation.add_profile_arguments(parser, "questions_puller/sampler.prof")
+    args = parser.parse_args()
+
+    with instrumentation.profiling(instrumentation.profile_path(args)):
+        sampler = FormSampler.for_age_group(args.age_group, args.seed)
+        sampler.write_jsonl(args.out, args.forms, age_group=args.age_group)
+        print(f"{args.forms} forms saved to: {args.out}")